@@ -6,19 +6,20 @@ A Flask web interface for the Simple Scripture Search system
 
 import sys
 import os
+import json
 import sqlite3
 from threading import Lock
 print("🔍 Starting Scripture Search Web App...")
 
 try:
-    from flask import Flask, render_template, request, jsonify, g
+    from flask import Flask, Response, render_template, request, jsonify, g
     print("✅ Flask imported successfully")
 except ImportError as e:
     print(f"❌ Flask import error: {e}")
     sys.exit(1)
 
 try:
-    from simple_scripture_search import SimpleScriptureSearch
+    from simple_scripture_search import SEARCH_MODES, SimpleScriptureSearch, decode_cursor, make_snippet
     print("✅ SimpleScriptureSearch imported successfully")
 except ImportError as e:
     print(f"❌ SimpleScriptureSearch import error: {e}")
@@ -30,8 +31,31 @@ app.secret_key = 'scripture_search_secret_key_2024'
 
 # Database path
 DATABASE_PATH = 'simple_scriptures.db'
+# Text search engine: 'memory' (in-process inverted index) or 'sql' (SQLite FTS5)
+SEARCH_ENGINE = 'memory'
+# Build the LSA/faiss index behind /search?mode=semantic at startup; otherwise the first semantic search builds it
+SEMANTIC_INDEX = True
+# Largest page /search will return; further results are fetched with next_cursor
+MAX_PAGE_SIZE = 200
+# Most references one POST /references request may resolve
+MAX_REFERENCES = 2000
+# Search result cache (see query_cache.py); CACHE_SIZE = 0 turns it off
+CACHE_SIZE = 1024
+CACHE_TTL = 3600  # seconds
+# (query, limit) pairs run at startup so the landing page's quick searches start warm
+CACHE_WARM_QUERIES = [
+    ('faith hope charity', 20),
+    ('word of wisdom', 20),
+    ('eternal life', 20),
+    ('love thy neighbor', 20),
+    ('endure to the end', 20),
+    ('John 3:16', 200),
+    ('1 Nephi 1:1', 200),
+    ('Doctrine and Covenants 76', 200),
+]
 init_lock = Lock()
 data_loaded = False
+scripture_search = None  # Shared search state, bound to a per-request connection in get_search()
 
 def get_db():
     """Get a database connection for the current thread"""
@@ -48,13 +72,13 @@ def close_db(error):
 
 def initialize_data_once():
     """Initialize data only once, thread-safely"""
-    global data_loaded
+    global data_loaded, scripture_search
     
     with init_lock:
         if not data_loaded:
             print("Initializing scripture data...")
             
-            # Create a temporary search system just for loading data
+            # Create the shared search system and load data into it
             temp_search = SimpleScriptureSearch()
             
             # Check if we need to load CSV files
@@ -69,291 +93,64 @@ def initialize_data_once():
                 ]
                 
                 for csv_file, name in csv_files:
-                    if os.path.exists(csv_file):
-                        try:
-                            print(f"Loading {csv_file}...")
-                            temp_search.load_csv_file(csv_file, name)
-                            print(f"✅ Loaded {name}")
-                        except Exception as e:
-                            print(f"❌ Error loading {csv_file}: {e}")
-                    else:
+                    if not os.path.exists(csv_file):
                         print(f"⚠️  CSV file not found: {csv_file}")
+                
+                # In this process: worker processes should not be forked from a request thread
+                try:
+                    temp_search.load_csv_files([(csv_file, name) for csv_file, name in csv_files
+                                                if os.path.exists(csv_file)], workers=1)
+                except Exception as e:
+                    print(f"❌ Error loading CSV files: {e}")
+            
+            if SEARCH_ENGINE == 'memory':
+                temp_search.build_index()
+            temp_search.build_term_dictionary()
+            if SEMANTIC_INDEX:
+                try:
+                    temp_search.build_semantic_index()
+                except ImportError as e:
+                    print(f"⚠️  Semantic search unavailable: {e}")
             
+            if CACHE_SIZE:
+                temp_search.enable_cache(CACHE_SIZE, CACHE_TTL)
+                warmed = temp_search.warm_cache(CACHE_WARM_QUERIES)
+                print(f"✅ Warmed result cache with {warmed} queries")
+            
+            scripture_search = temp_search
             data_loaded = True
             print("✅ Data initialization complete")
 
-def search_scriptures_thread_safe(query, limit=20, volume_filter=None):
-    """Enhanced thread-safe scripture search with reference parsing"""
-    db = get_db()
-    
-    # Create search instance for reference parsing
-    from simple_scripture_search import SimpleScriptureSearch, ScriptureReferenceParser
-    parser = ScriptureReferenceParser()
-    
-    # Check if query looks like a scripture reference
-    if parser.is_reference_query(query):
-        print(f"🔍 Detected reference query: '{query}'")
-        reference_params_list = parser.parse_reference(query)
-        
-        if reference_params_list:
-            reference_params = reference_params_list[0]
-            print(f"📖 Parsed reference: {reference_params}")
-            
-            # Build SQL query based on reference parameters
-            cursor = db.cursor()
-            sql = 'SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url FROM scriptures WHERE book = ?'
-            params = [reference_params['book']]
-            
-            if 'chapter' in reference_params:
-                sql += ' AND chapter = ?'
-                params.append(reference_params['chapter'])
-            
-            if 'verse' in reference_params:
-                sql += ' AND verse = ?'
-                params.append(reference_params['verse'])
-            elif 'verse_start' in reference_params and 'verse_end' in reference_params:
-                sql += ' AND verse BETWEEN ? AND ?'
-                params.extend([reference_params['verse_start'], reference_params['verse_end']])
-            
-            if volume_filter and volume_filter != 'all':
-                sql += ' AND volume = ?'
-                params.append(volume_filter)
-            
-            sql += ' ORDER BY chapter, verse'
-            
-            cursor.execute(sql, params)
-            results = []
-            
-            for row in cursor.fetchall():
-                results.append({
-                    'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                    'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                    'lds_url': row[8], 'reference': f"{row[1]} {row[2]}:{row[3]}",
-                    'match_type': 'reference_lookup', 'relevance_score': 100.0
-                })
-            
-            if results:
-                print(f"✅ Found {len(results)} verses for reference")
-                return results
-            else:
-                print(f"❌ No verses found for reference '{query}', falling back to text search")
-        else:
-            print(f"⚠️  Could not parse reference '{query}', falling back to text search")
-    
-    # Fall back to regular text search (your existing code)
-    cursor = db.cursor()
-    
-    # Clean and prepare query
-    import re
-    query_clean = query.strip().lower()
-    query_words = re.findall(r'\b\w+\b', query_clean)
-    
-    results = []
-    
-    # Strategy 1: Exact phrase match
-    if len(query_clean) > 3:
-        sql = '''
-            SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-            FROM scriptures 
-            WHERE LOWER(text) LIKE ?
-        '''
-        params = [f'%{query_clean}%']
-        
-        if volume_filter and volume_filter != 'all':
-            sql += ' AND volume = ?'
-            params.append(volume_filter)
-        
-        sql += ' ORDER BY LENGTH(text) LIMIT ?'
-        params.append(limit)
-        
-        cursor.execute(sql, params)
-        for row in cursor.fetchall():
-            results.append({
-                'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                'lds_url': row[8], 'reference': f"{row[1]} {row[2]}:{row[3]}",
-                'match_type': 'exact_phrase', 'relevance_score': 10.0
-            })
-    
-    # Strategy 2: All words present (only if we need more results)
-    if query_words and len(results) < limit:
-        conditions = []
-        params = []
-        
-        for word in query_words:
-            if len(word) > 2:
-                conditions.append('LOWER(text) LIKE ?')
-                params.append(f'%{word}%')
-        
-        if conditions:
-            sql = f'''
-                SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-                FROM scriptures 
-                WHERE {' AND '.join(conditions)}
-            '''
-            
-            if volume_filter and volume_filter != 'all':
-                sql += ' AND volume = ?'
-                params.append(volume_filter)
-            
-            sql += ' ORDER BY LENGTH(text) LIMIT ?'
-            params.append(limit - len(results))
-            
-            cursor.execute(sql, params)
-            for row in cursor.fetchall():
-                ref = f"{row[1]} {row[2]}:{row[3]}"
-                if not any(r['reference'] == ref for r in results):
-                    results.append({
-                        'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                        'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                        'lds_url': row[8], 'reference': ref,
-                        'match_type': 'all_words', 'relevance_score': 8.0
-                    })
-    
-    # Calculate better relevance scores
-    for result in results:
-        score = 0
-        text_lower = result['text'].lower()
-        for word in query_words:
-            if len(word) > 2:
-                count = text_lower.count(word.lower())
-                if count > 0:
-                    score += count * (1 + len(word) / 10)
-        
-        import math
-        if len(result['text']) > 0:
-            score = score / math.log(len(result['text']) + 1)
-        
-        result['relevance_score'] = round(score, 2)
-    
-    # Sort by relevance
-    results.sort(key=lambda x: x['relevance_score'], reverse=True)
-    
-    db = get_db()
-    cursor = db.cursor()
-    
-    # Clean and prepare query
-    import re
-    query_clean = query.strip().lower()
-    query_words = re.findall(r'\b\w+\b', query_clean)
-    
-    results = []
-    
-    # Strategy 1: Exact phrase match
-    if len(query_clean) > 3:
-        sql = '''
-            SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-            FROM scriptures 
-            WHERE LOWER(text) LIKE ?
-        '''
-        params = [f'%{query_clean}%']
-        
-        if volume_filter:
-            sql += ' AND volume = ?'
-            params.append(volume_filter)
-        
-        sql += ' ORDER BY LENGTH(text) LIMIT ?'
-        params.append(limit)  # Changed from limit // 2 to full limit
-        
-        cursor.execute(sql, params)
-        for row in cursor.fetchall():
-            results.append({
-                'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                'lds_url': row[8], 'reference': f"{row[1]} {row[2]}:{row[3]}",
-                'match_type': 'exact_phrase', 'relevance_score': 10.0
-            })
-    
-    # Strategy 2: All words present (only if we need more results)
-    if query_words and len(results) < limit:
-        conditions = []
-        params = []
-        
-        for word in query_words:
-            if len(word) > 2:
-                conditions.append('LOWER(text) LIKE ?')
-                params.append(f'%{word}%')
-        
-        if conditions:
-            sql = f'''
-                SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-                FROM scriptures 
-                WHERE {' AND '.join(conditions)}
-            '''
-            
-            if volume_filter:
-                sql += ' AND volume = ?'
-                params.append(volume_filter)
-            
-            sql += ' ORDER BY LENGTH(text) LIMIT ?'
-            params.append(limit - len(results))
-            
-            cursor.execute(sql, params)
-            for row in cursor.fetchall():
-                ref = f"{row[1]} {row[2]}:{row[3]}"
-                if not any(r['reference'] == ref for r in results):
-                    results.append({
-                        'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                        'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                        'lds_url': row[8], 'reference': ref,
-                        'match_type': 'all_words', 'relevance_score': 8.0
-                    })
-    
-    # Strategy 3: Any word present (only if we still need more results)
-    if query_words and len(results) < limit:
-        word_conditions = []
-        params = []
-        
-        for word in query_words:
-            if len(word) > 2:
-                word_conditions.append('LOWER(text) LIKE ?')
-                params.append(f'%{word}%')
-        
-        if word_conditions:
-            sql = f'''
-                SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-                FROM scriptures 
-                WHERE ({' OR '.join(word_conditions)})
-            '''
-            
-            if volume_filter:
-                sql += ' AND volume = ?'
-                params.append(volume_filter)
-            
-            sql += ' ORDER BY LENGTH(text) LIMIT ?'
-            params.append(limit - len(results))
-            
-            cursor.execute(sql, params)
-            for row in cursor.fetchall():
-                ref = f"{row[1]} {row[2]}:{row[3]}"
-                if not any(r['reference'] == ref for r in results):
-                    results.append({
-                        'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                        'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                        'lds_url': row[8], 'reference': ref,
-                        'match_type': 'any_word', 'relevance_score': 6.0
-                    })
-    
-    # Calculate better relevance scores
-    for result in results:
-        score = 0
-        text_lower = result['text'].lower()
-        for word in query_words:
-            if len(word) > 2:
-                count = text_lower.count(word.lower())
-                if count > 0:
-                    score += count * (1 + len(word) / 10)
-        
-        import math
-        if len(result['text']) > 0:
-            score = score / math.log(len(result['text']) + 1)
-        
-        result['relevance_score'] = round(score, 2)
-    
-    # Sort by relevance
-    results.sort(key=lambda x: x['relevance_score'], reverse=True)
-    
-    return results[:limit]
+def get_search():
+    """Get a SimpleScriptureSearch bound to the current request's database connection"""
+    if not hasattr(g, 'search'):
+        initialize_data_once()
+        g.search = scripture_search.with_connection(get_db())
+    return g.search
+
+def search_scriptures_thread_safe(query, limit=20, volume_filter=None, cursor=None, mode='keyword'):
+    """Thread-safe scripture search with reference parsing and full-text ranking"""
+    if volume_filter == 'all':
+        volume_filter = None
+    return get_search().search_text(query, limit=limit, volume_filter=volume_filter, cursor=cursor, mode=mode)
+
+def format_result(result, snippet_length=None):
+    """The JSON form of a search result, cut to a snippet around its highlights with snippet_length"""
+    text, highlights = result['text'], result.get('highlights', [])
+    if snippet_length:
+        text, highlights = make_snippet(text, highlights, snippet_length)
+    return {
+        'volume': result['volume'],
+        'book': result['book'],
+        'chapter': result['chapter'],
+        'verse': result['verse'],
+        'text': text,
+        'highlights': highlights,
+        'reference': result['reference'],
+        'score': round(result['relevance_score'], 2),
+        'match_type': result['match_type'],
+        'lds_url': result.get('lds_url', '')
+    }
 
 def get_stats_thread_safe():
     """Thread-safe statistics"""
@@ -396,6 +193,25 @@ def index():
         traceback.print_exc()
         return f"Error loading page: {e}", 500
 
+def search_args(default_limit=None):
+    """(volume_filter, limit, cursor, snippet_length, mode) of a search request; ValueError when one is invalid"""
+    volume = request.args.get('volume', 'all')
+    cursor = request.args.get('cursor') or None
+    mode = request.args.get('mode', 'keyword')
+    try:
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else default_limit
+        snippet_length = int(request.args.get('snippet', 0)) or None
+    except ValueError:
+        raise ValueError('limit and snippet must be whole numbers')
+    if (limit is not None and limit < 1) or (snippet_length is not None and snippet_length < 0):
+        raise ValueError('limit must be positive and snippet not negative')
+    if mode not in SEARCH_MODES:
+        raise ValueError(f'Unknown search mode: {mode!r}')
+    if cursor:
+        decode_cursor(cursor)
+    return None if volume == 'all' else volume, limit, cursor, snippet_length, mode
+
 @app.route('/search')
 def search():
     """Handle search requests"""
@@ -406,40 +222,54 @@ def search():
         
         query = request.args.get('q', '').strip()
         volume = request.args.get('volume', 'all')
-        limit = int(request.args.get('limit', 20))  # Changed default from 10 to 20
+        try:
+            volume_filter, limit, cursor, snippet_length, mode = search_args(default_limit=20)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'results': []}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+        include_facets = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
         
         print(f"Query: '{query}', Volume: '{volume}', Limit: {limit}")
         
         if not query:
             return jsonify({'error': 'No search query provided', 'results': []})
         
-        # Use volume filter if specified
-        volume_filter = None if volume == 'all' else volume
-        
-        results = search_scriptures_thread_safe(query, limit=limit, volume_filter=volume_filter)
+        facets = None
+        try:
+            # Semantic results are a nearest-neighbour list, not a match set to count
+            if include_facets and mode == 'keyword':
+                page = get_search().search_with_facets(query, limit=limit, volume_filter=volume_filter,
+                                                       cursor=cursor, mode=mode)
+                results, facets = page['results'], page['facets']
+            else:
+                results = search_scriptures_thread_safe(query, limit=limit, volume_filter=volume_filter,
+                                                        cursor=cursor, mode=mode)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'results': []}), 400
         print(f"Found {len(results)} results")
         
         # Format results for JSON response
-        formatted_results = []
-        for result in results:
-            formatted_results.append({
-                'volume': result['volume'],
-                'book': result['book'],
-                'chapter': result['chapter'],
-                'verse': result['verse'],
-                'text': result['text'],
-                'reference': result['reference'],
-                'score': result['relevance_score'],
-                'match_type': result['match_type'],
-                'lds_url': result.get('lds_url', '')
-            })
+        formatted_results = [format_result(result, snippet_length) for result in results]
         
-        return jsonify({
+        # Link each verse to its parallel passages in other volumes (one keyed read for the page)
+        parallels = get_search().parallel_passages([result['id'] for result in results if 'id' in result])
+        for result, formatted in zip(results, formatted_results):
+            formatted['parallels'] = parallels.get(result.get('id'), [])
+        
+        corrected_query = results[0].get('corrected_query') if results else None
+        response = {
             'query': query,
+            'corrected_query': corrected_query,
             'volume': volume,
+            'mode': mode,
             'total_results': len(formatted_results),
-            'results': formatted_results
-        })
+            'results': formatted_results,
+            'next_cursor': get_search().next_cursor(results, limit)
+        }
+        if facets is not None:
+            response['facets'] = facets
+        
+        return jsonify(response)
         
     except Exception as e:
         print(f"❌ Search error: {e}")
@@ -447,12 +277,143 @@ def search():
         traceback.print_exc()
         return jsonify({'error': f'Search error: {str(e)}', 'results': []})
 
+@app.route('/search/stream')
+def search_stream():
+    """Stream every result of a search as newline-delimited JSON, one verse per line"""
+    query = request.args.get('q', '').strip()
+    try:
+        volume_filter, limit, cursor, snippet_length, mode = search_args()
+    except ValueError as e:
+        return jsonify({'error': str(e), 'results': []}), 400
+    if not query:
+        return jsonify({'error': 'No search query provided', 'results': []}), 400
+    
+    initialize_data_once()
+    
+    def generate():
+        # The stream outlives the request's connection, so it reads through its own
+        conn = sqlite3.connect(DATABASE_PATH)
+        try:
+            search = scripture_search.with_connection(conn)
+            for result in search.iter_search(query, volume_filter=volume_filter, limit=limit, cursor=cursor, mode=mode):
+                line = format_result(result, snippet_length)
+                if result.get('corrected_query'):
+                    line['corrected_query'] = result['corrected_query']
+                yield json.dumps(line) + '\n'
+        finally:
+            conn.close()
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/similar')
+def similar():
+    """Verses related to one verse, e.g. /similar?ref=Alma 32:21"""
+    try:
+        reference = request.args.get('ref', '').strip()
+        limit = max(1, min(int(request.args.get('limit', 10)), MAX_PAGE_SIZE))
+        
+        if not reference:
+            return jsonify({'error': 'No verse reference provided', 'results': []})
+        
+        results = get_search().similar_verses(reference, limit)
+        if not results:
+            return jsonify({
+                'error': f'No similar verses found for "{reference}" '
+                         '(is it a single verse, and has "python semantic_search.py" been run?)',
+                'results': []
+            })
+        
+        return jsonify({
+            'reference': reference,
+            'total_results': len(results),
+            'results': [format_result(result) for result in results]
+        })
+        
+    except Exception as e:
+        print(f"❌ Similar verses error: {e}")
+        return jsonify({'error': f'Similar verses error: {str(e)}', 'results': []})
+
+@app.route('/references', methods=['POST'])
+def references():
+    """Resolve a list of references in one request: {"references": [...] or "a; b", "volume": "all"}"""
+    try:
+        initialize_data_once()
+        
+        body = request.get_json(silent=True) or {}
+        reference_list = body.get('references', [])
+        if isinstance(reference_list, str):
+            reference_list = [reference_list]
+        if not isinstance(reference_list, list) or not all(isinstance(item, str) for item in reference_list):
+            return jsonify({'error': '"references" must be a list of strings', 'references': []}), 400
+        if len(reference_list) > MAX_REFERENCES:
+            return jsonify({'error': f'At most {MAX_REFERENCES} references per request', 'references': []}), 400
+        volume = body.get('volume', 'all')
+        volume_filter = None if volume == 'all' else volume
+        
+        resolved = get_search().resolve_references(reference_list, volume_filter)
+        return jsonify({
+            'total_references': len(resolved),
+            'resolved': sum(1 for entry in resolved if entry['results']),
+            'references': [
+                {
+                    'reference': entry['reference'],
+                    'book': entry['book'],
+                    'results': [format_result(result) for result in entry['results']]
+                }
+                for entry in resolved
+            ]
+        })
+        
+    except Exception as e:
+        print(f"❌ References error: {e}")
+        return jsonify({'error': f'References error: {str(e)}', 'references': []})
+
+@app.route('/concordance')
+def concordance():
+    """Occurrences of a word by volume and book, with its top collocations, e.g. /concordance?word=faith"""
+    try:
+        initialize_data_once()
+        
+        word = request.args.get('word', '').strip()
+        collocations = max(1, min(int(request.args.get('collocations', 10)), MAX_PAGE_SIZE))
+        
+        if not word:
+            return jsonify({'error': 'No word provided'})
+        
+        try:
+            return jsonify(get_search().concordance(word, collocations))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+    except Exception as e:
+        print(f"❌ Concordance error: {e}")
+        return jsonify({'error': f'Concordance error: {str(e)}'})
+
+@app.route('/suggest')
+def suggest():
+    """Search-as-you-type suggestions: book names and term completions"""
+    try:
+        prefix = request.args.get('prefix', '')
+        limit = min(int(request.args.get('limit', 8)), 50)
+        
+        if not prefix.strip():
+            return jsonify({'prefix': prefix, 'books': [], 'terms': []})
+        
+        initialize_data_once()
+        return jsonify(scripture_search.suggest(prefix, limit))
+        
+    except Exception as e:
+        print(f"❌ Suggest error: {e}")
+        return jsonify({'error': f'Suggest error: {str(e)}', 'books': [], 'terms': []})
+
 @app.route('/stats')
 def stats():
     """Get database statistics"""
     try:
         initialize_data_once()
         stats = get_stats_thread_safe()
+        if scripture_search.result_cache is not None:
+            stats['cache'] = scripture_search.result_cache.stats()
         return jsonify(stats)
         
     except Exception as e:
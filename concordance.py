@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Concordance: how often every word occurs in each book, and which words it keeps company with
+Counts live in the word_counts and collocations tables, kept up to date as verses are loaded
+"""
+
+import sqlite3
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from scripture_index import tokenize
+
+# Words this many positions apart or closer count as collocations
+COLLOCATION_WINDOW = 2
+
+# Function words that would top every collocation list; their own counts are still kept
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'he', 'her', 'him',
+    'his', 'i', 'in', 'is', 'it', 'me', 'my', 'not', 'of', 'on', 'or', 'so', 'that', 'the',
+    'their', 'them', 'they', 'this', 'to', 'was', 'we', 'were', 'which', 'with', 'ye', 'you',
+    'thee', 'thou', 'thy', 'unto', 'shall', 'hath', 'all', 'have', 'had', 'will', 'there',
+})
+
+def count_words(verses: Iterable[Tuple[str, str, str]]) -> Tuple[Counter, Counter, Counter]:
+    """Occurrences and verse counts per (word, volume, book) and collocation counts of (volume, book, text) tuples"""
+    occurrences, verse_counts, collocations = Counter(), Counter(), Counter()
+    for volume, book, text in verses:
+        words = tokenize(text)
+        occurrences.update((word, volume, book) for word in words)
+        verse_counts.update((word, volume, book) for word in set(words))
+        # Stop words become None so they never pair up but still count as distance
+        content = [None if word in STOP_WORDS else word for word in words]
+        for distance in range(1, COLLOCATION_WINDOW + 1):
+            pairs = [(word, neighbor) for word, neighbor in zip(content, content[distance:])
+                     if word and neighbor and word != neighbor]
+            collocations.update(pairs)
+            collocations.update((neighbor, word) for word, neighbor in pairs)
+    return occurrences, verse_counts, collocations
+
+def update_concordance(cursor: sqlite3.Cursor, verses: Iterable[Tuple[str, str, str]], sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) the words of verses to/from the concordance tables"""
+    merge_counts(cursor, count_words(verses), sign)
+
+def merge_counts(cursor: sqlite3.Cursor, counts: Tuple[Counter, Counter, Counter], sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) counts from count_words() to/from the concordance tables"""
+    occurrences, verse_counts, collocations = counts
+    cursor.executemany('''
+        INSERT INTO word_counts (word, volume, book, occurrences, verses) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (word, volume, book) DO UPDATE SET
+            occurrences = occurrences + excluded.occurrences,
+            verses = verses + excluded.verses
+    ''', ((word, volume, book, sign * count, sign * verse_counts[word, volume, book])
+          for (word, volume, book), count in occurrences.items()))
+    cursor.executemany('''
+        INSERT INTO collocations (word, neighbor, occurrences) VALUES (?, ?, ?)
+        ON CONFLICT (word, neighbor) DO UPDATE SET occurrences = occurrences + excluded.occurrences
+    ''', ((word, neighbor, sign * count) for (word, neighbor), count in collocations.items()))
+    if sign < 0:
+        # Only the keys just touched can have dropped to zero, so skip scanning the whole tables
+        cursor.executemany('DELETE FROM word_counts WHERE word = ? AND volume = ? AND book = ? AND occurrences <= 0',
+                           occurrences.keys())
+        cursor.executemany('DELETE FROM collocations WHERE word = ? AND neighbor = ? AND occurrences <= 0',
+                           collocations.keys())
+
+def rebuild_concordance(cursor: sqlite3.Cursor):
+    """Recount the concordance tables from every verse in the scriptures table"""
+    cursor.execute('DELETE FROM word_counts')
+    cursor.execute('DELETE FROM collocations')
+    update_concordance(cursor, cursor.connection.execute('SELECT volume, book, text FROM scriptures'))
+
+def lookup(conn: sqlite3.Connection, word: str, collocation_limit: int = 10) -> Dict:
+    """Occurrence counts of word in total, per volume and per book (most first), plus its top collocations"""
+    words = tokenize(word)
+    if len(words) != 1:
+        raise ValueError('A concordance lookup takes a single word')
+    word = words[0]
+    volumes, books = {}, []
+    total = verses = 0
+    rows = conn.execute('''
+        SELECT volume, book, occurrences, verses
+        FROM word_counts
+        WHERE word = ?
+        ORDER BY occurrences DESC, volume, book
+    ''', (word,))
+    for volume, book, occurrences, verse_count in rows:
+        volumes[volume] = volumes.get(volume, 0) + occurrences
+        books.append({'volume': volume, 'book': book, 'occurrences': occurrences, 'verses': verse_count})
+        total += occurrences
+        verses += verse_count
+
+    collocations = conn.execute('''
+        SELECT neighbor, occurrences FROM collocations
+        WHERE word = ?
+        ORDER BY occurrences DESC, neighbor
+        LIMIT ?
+    ''', (word, collocation_limit)).fetchall()
+    return {
+        'word': word,
+        'occurrences': total,
+        'verses': verses,
+        'volumes': volumes,
+        'books': books,
+        'collocations': [{'word': neighbor, 'occurrences': count} for neighbor, count in collocations],
+    }
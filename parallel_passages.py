@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Parallel-passage detection: near-duplicate verses across volumes
+MinHash signatures with LSH banding, computed on a process pool
+"""
+
+import os
+import sqlite3
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from scripture_index import tokenize
+
+SHINGLE_SIZE = 3  # words per shingle
+MIN_SHINGLES = 4  # shorter verses ("Jesus wept.") are too generic to call parallels
+NUM_PERMUTATIONS = 128
+BANDS = 32  # of NUM_PERMUTATIONS // BANDS rows each; pairs above ~0.4 similarity share a band
+MIN_SIMILARITY = 0.5  # estimated Jaccard similarity of the shingle sets
+MAX_BUCKET = 50  # larger buckets are stock phrases, not parallels
+CHUNK_SIZE = 2000  # verses per worker task
+
+# Universal hashing (a * x + b) mod p over the 31-bit Mersenne prime, in uint64 without overflow
+PRIME = (1 << 31) - 1
+
+def _permutations(seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    random = np.random.default_rng(seed)
+    return (random.integers(1, PRIME, NUM_PERMUTATIONS, dtype=np.uint64),
+            random.integers(0, PRIME, NUM_PERMUTATIONS, dtype=np.uint64))
+
+def shingles(text: str) -> set:
+    """CRC32 hashes of the overlapping SHINGLE_SIZE-word windows of text"""
+    tokens = tokenize(text)
+    return {zlib.crc32(' '.join(tokens[i:i + SHINGLE_SIZE]).encode())
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def minhash_signatures(texts: Sequence[str], seed: int = 1) -> np.ndarray:
+    """MinHash signatures of the texts' shingle sets; too short verses get an all-PRIME "no signature" row"""
+    a, b = _permutations(seed)
+    verse_shingles = [shingles(text) for text in texts]
+    counts = np.array([len(found) if len(found) >= MIN_SHINGLES else 0 for found in verse_shingles])
+    hashes = np.fromiter((shingle for found, count in zip(verse_shingles, counts) if count for shingle in found),
+                         dtype=np.uint64, count=int(counts.sum()))
+
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), PRIME, dtype=np.uint32)
+    if len(hashes):
+        values = (a[:, None] * hashes[None, :] + b[:, None]) % PRIME
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        present = counts > 0
+        signatures[present] = np.minimum.reduceat(values, starts[present], axis=1).T
+    return signatures
+
+def candidate_pairs(signatures: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+    """(i, j) pairs, i < j, of cross-volume verses that share at least one LSH band"""
+    rows_per_band = NUM_PERMUTATIONS // BANDS
+    usable = np.flatnonzero(signatures[:, 0] != PRIME)
+    pairs = set()
+    for band in range(BANDS):
+        keys = np.ascontiguousarray(signatures[usable, band * rows_per_band:(band + 1) * rows_per_band])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * rows_per_band))).ravel()
+        _, bucket_of, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = np.flatnonzero((sizes > 1) & (sizes <= MAX_BUCKET))
+        if not len(shared):
+            continue
+        in_shared = np.isin(bucket_of, shared)
+        members, buckets = usable[in_shared], bucket_of[in_shared]
+        order = np.argsort(buckets, kind='stable')
+        members, buckets = members[order], buckets[order]
+        for bucket in np.split(members, np.flatnonzero(np.diff(buckets)) + 1):
+            for position, first in enumerate(bucket):
+                for second in bucket[position + 1:]:
+                    if volumes[first] != volumes[second]:
+                        pairs.add((first, second))
+    return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+def find_parallel_passages(conn: sqlite3.Connection, workers: int = None) -> List[Tuple[int, int, float]]:
+    """(verse id, verse id, similarity) for every cross-volume pair of near-duplicate verses"""
+    rows = conn.execute('SELECT id, volume, text FROM scriptures ORDER BY id').fetchall()
+    if not rows:
+        return []
+    row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    volume_codes = {}
+    volumes = np.array([volume_codes.setdefault(row[1], len(volume_codes)) for row in rows])
+    texts = [row[2] for row in rows]
+
+    chunks = [texts[start:start + CHUNK_SIZE] for start in range(0, len(texts), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        signatures = np.concatenate(list(pool.map(minhash_signatures, chunks)))
+
+    pairs = candidate_pairs(signatures, volumes)
+    if not len(pairs):
+        return []
+    # The share of equal MinHash values estimates the Jaccard similarity
+    similarities = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    keep = similarities >= MIN_SIMILARITY
+    return [(int(row_ids[i]), int(row_ids[j]), float(similarity))
+            for (i, j), similarity in zip(pairs[keep], similarities[keep])]
+
+def main():
+    """Find and store parallel passages: python parallel_passages.py [db_path]"""
+    from simple_scripture_search import SimpleScriptureSearch
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'simple_scriptures.db'
+    SimpleScriptureSearch(db_path).build_parallel_passages()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Bounded LRU cache for search results
+Entries expire after a time-to-live; shared by every request thread behind a lock
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Hashable, Optional
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so 'john  3:16 ' and 'john 3:16' share an entry"""
+    return ' '.join(query.split())
+
+class QueryCache:
+    """Thread-safe LRU cache with a per-entry time-to-live"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        """Cached value for key, or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry, e.g. after the corpus changes"""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -9,8 +9,11 @@ def main():
     
     # Load your data
     print("Loading scripture data...")
-    search.load_csv_file("kjvscriptures.csv", "KJV Scriptures")
-    search.load_csv_file("ldsscriptures.csv", "LDS Scriptures")
+    search.load_csv_files([("kjvscriptures.csv", "KJV Scriptures"),
+                           ("ldsscriptures.csv", "LDS Scriptures")])
+    
+    # Load the verses into memory for fast text search
+    search.build_index()
     
     # Show statistics
     search.get_statistics()
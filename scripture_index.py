@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+In-memory inverted index over the scriptures table
+Answers text searches with NumPy set operations and holds the term dictionary for suggestions
+"""
+
+import re
+import sqlite3
+from array import array
+from bisect import bisect_left
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return [match.group().lower() for match in TOKEN_PATTERN.finditer(text)]
+
+def tokenize_with_offsets(text: str) -> Tuple[List[str], List[int]]:
+    """Like tokenize, plus the character offset in text where each token starts"""
+    matches = list(TOKEN_PATTERN.finditer(text))
+    return [match.group().lower() for match in matches], [match.start() for match in matches]
+
+class ScriptureIndex:
+    """Read-only inverted index (term -> sorted int32 document numbers) with a BM25 document-term matrix"""
+
+    # BM25 term-frequency saturation and length normalization
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, rows: Iterable[tuple]):
+        """Build the index from (id, volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url) rows"""
+        self.rows = []
+        row_ids = []
+        doc_lengths = []
+        doc_volumes = []
+        volume_codes = {}
+        doc_books = []
+        book_codes = {}
+        term_ids = {}
+        token_docs = array('i')
+        token_terms = array('i')
+        token_positions = array('i')
+        token_offsets = array('i')
+
+        for doc, row in enumerate(rows):
+            row_ids.append(row[0])
+            self.rows.append(tuple(row[1:]))
+
+            volume = row[1]
+            if volume not in volume_codes:
+                volume_codes[volume] = len(volume_codes)
+            doc_volumes.append(volume_codes[volume])
+            doc_books.append(book_codes.setdefault(row[2], len(book_codes)))
+
+            tokens, offsets = tokenize_with_offsets(row[5])
+            doc_lengths.append(len(tokens))
+            token_docs.extend([doc] * len(tokens))
+            token_terms.extend(term_ids.setdefault(term, len(term_ids)) for term in tokens)
+            token_positions.extend(range(len(tokens)))
+            token_offsets.extend(offsets)
+
+        self.row_ids = np.array(row_ids, dtype=np.int64)
+        self.doc_lengths = np.array(doc_lengths, dtype=np.int32)
+        self.doc_volumes = np.array(doc_volumes, dtype=np.int32)
+        self.volume_codes = volume_codes
+        self.doc_books = np.array(doc_books, dtype=np.int32)
+        self.book_codes = book_codes
+        self.term_ids = term_ids
+        self._empty = np.array([], dtype=np.int32)
+
+        token_docs = np.frombuffer(token_docs, dtype=np.int32)
+        token_terms = np.frombuffer(token_terms, dtype=np.int32)
+        token_positions = np.frombuffer(token_positions, dtype=np.int32)
+        token_offsets = np.frombuffer(token_offsets, dtype=np.int32)
+
+        # Duplicate (document, term) entries are summed into term frequencies
+        shape = (len(self.rows), len(term_ids))
+        counts = sparse.csr_matrix(
+            (np.ones(len(token_docs), dtype=np.float32), (token_docs, token_terms)), shape=shape)
+        counts.sum_duplicates()
+
+        # Postings are the column structure of the document-term matrix
+        by_term = counts.tocsc()
+        by_term.sort_indices()
+        self.doc_freqs = np.diff(by_term.indptr).astype(np.int32)
+        self.postings = {
+            term: by_term.indices[by_term.indptr[term_id]:by_term.indptr[term_id + 1]]
+            for term, term_id in term_ids.items()
+        }
+
+        # Positional index: token positions grouped by term, then document, in
+        # the same order as the postings entries, so entry e of the column
+        # structure owns positions[position_ptr[e]:position_ptr[e + 1]]. Character
+        # offsets of the same occurrences are kept in offsets, for highlighting.
+        self._by_term = by_term
+        order = np.lexsort((token_positions, token_docs, token_terms))
+        self.positions = token_positions[order]
+        self.offsets = token_offsets[order]
+        self.position_ptr = np.concatenate(([0], np.cumsum(by_term.data.astype(np.int64))))
+
+        # BM25 weight for every (document, term) pair, computed once
+        n_docs = max(len(self.rows), 1)
+        self.idf = np.log(1 + (n_docs - self.doc_freqs + 0.5) / (self.doc_freqs + 0.5)).astype(np.float32)
+        avg_length = self.doc_lengths.mean() if len(self.rows) else 1.0
+        length_norm = self.K1 * (1 - self.B + self.B * self.doc_lengths / max(avg_length, 1.0))
+        tf = counts.data
+        doc_of_entry = np.repeat(np.arange(shape[0]), np.diff(counts.indptr))
+        weights = self.idf[counts.indices] * tf * (self.K1 + 1) / (tf + length_norm[doc_of_entry])
+        self.bm25 = sparse.csr_matrix((weights.astype(np.float32), counts.indices, counts.indptr), shape=shape)
+
+        # Largest contribution each term makes to any verse: the MaxScore upper bounds
+        bm25_by_term = self.bm25.tocsc()
+        if bm25_by_term.nnz:
+            self.max_weights = np.maximum.reduceat(bm25_by_term.data, bm25_by_term.indptr[:-1])
+        else:
+            self.max_weights = np.zeros(len(term_ids), dtype=np.float32)
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> 'ScriptureIndex':
+        """Load every verse from the scriptures table into a new index"""
+        cursor = conn.execute('''
+            SELECT id, volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
+            FROM scriptures ORDER BY id
+        ''')
+        return cls(cursor)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def postings_for(self, term: str) -> np.ndarray:
+        """Sorted document numbers containing term"""
+        return self.postings.get(term, self._empty)
+
+    def match_all(self, terms: List[str]) -> np.ndarray:
+        """Documents containing every term"""
+        if not terms:
+            return self._empty
+        # Intersect the shortest lists first so intermediate results stay small
+        lists = sorted((self.postings_for(term) for term in set(terms)), key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists)
+
+    def match_any(self, terms: List[str]) -> np.ndarray:
+        """Documents containing at least one term"""
+        lists = [self.postings_for(term) for term in set(terms)]
+        if not lists:
+            return self._empty
+        return np.unique(np.concatenate(lists))
+
+    def term_occurrences(self, term: str, docs: np.ndarray = None) -> np.ndarray:
+        """Sorted occurrence keys (document << 32 | position) of term, optionally only within docs"""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return np.array([], dtype=np.int64)
+        start, end = self._by_term.indptr[term_id], self._by_term.indptr[term_id + 1]
+        term_docs = self._by_term.indices[start:end]
+        term_freqs = self._by_term.data[start:end].astype(np.int64)
+        positions = self.positions[self.position_ptr[start]:self.position_ptr[end]]
+        doc_of_position = np.repeat(term_docs, term_freqs)
+        if docs is not None:
+            keep = np.isin(doc_of_position, docs)
+            doc_of_position, positions = doc_of_position[keep], positions[keep]
+        return (doc_of_position.astype(np.int64) << 32) | positions
+
+    def phrase_occurrences(self, tokens: List[str], docs: np.ndarray = None) -> np.ndarray:
+        """Occurrence keys of the first token of every consecutive match of tokens"""
+        if not tokens:
+            return np.array([], dtype=np.int64)
+        candidates = self.match_all(tokens)
+        if docs is not None:
+            candidates = np.intersect1d(candidates, docs, assume_unique=True)
+        starts = self.term_occurrences(tokens[0], candidates)
+        for offset, token in enumerate(tokens[1:], 1):
+            if not len(starts):
+                break
+            # A phrase continues where token sits exactly offset positions after the start
+            starts = np.intersect1d(starts, self.term_occurrences(token, candidates) - offset,
+                                    assume_unique=True)
+        return starts
+
+    def match_phrase(self, tokens: List[str]) -> np.ndarray:
+        """Documents containing tokens as a consecutive phrase"""
+        return np.unique(self.phrase_occurrences(tokens) >> 32).astype(np.int32)
+
+    def match_near(self, left: List[str], right: List[str], distance: int) -> np.ndarray:
+        """Documents where phrases left and right are at most distance tokens apart, in either order (FTS5 NEAR)"""
+        candidates = np.intersect1d(self.match_all(left), self.match_all(right), assume_unique=True)
+        left_starts = self.phrase_occurrences(left, candidates)
+        right_starts = self.phrase_occurrences(right, candidates)
+        if not len(left_starts) or not len(right_starts):
+            return self._empty
+        # Window of right-phrase starts that are near each left-phrase start
+        low = np.searchsorted(right_starts, left_starts - distance - len(right), side='left')
+        high = np.searchsorted(right_starts, left_starts + len(left) + distance, side='right')
+        return np.unique(left_starts[high > low] >> 32).astype(np.int32)
+
+    def doc_for_id(self, row_id: int) -> Optional[int]:
+        """Document number of the verse with scriptures.id row_id"""
+        doc = int(np.searchsorted(self.row_ids, row_id))
+        return doc if doc < len(self.row_ids) and self.row_ids[doc] == row_id else None
+
+    def highlights(self, doc: int, terms: List[str]) -> List[Tuple[int, int]]:
+        """Sorted (start, end) character spans in doc's text of every occurrence of terms"""
+        spans = []
+        for term in set(terms):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self._by_term.indptr[term_id], self._by_term.indptr[term_id + 1]
+            entry = start + int(np.searchsorted(self._by_term.indices[start:end], doc))
+            if entry == end or self._by_term.indices[entry] != doc:
+                continue
+            offsets = self.offsets[self.position_ptr[entry]:self.position_ptr[entry + 1]]
+            spans.extend((int(offset), int(offset) + len(term)) for offset in offsets)
+        return sorted(spans)
+
+    def all_docs(self) -> np.ndarray:
+        """Every document number"""
+        return np.arange(len(self.rows), dtype=np.int32)
+
+    def match_field(self, name: str, value: str) -> np.ndarray:
+        """Documents whose volume or book (case-insensitively) equals value"""
+        codes, doc_codes = {'volume': (self.volume_codes, self.doc_volumes),
+                            'book': (self.book_codes, self.doc_books)}[name]
+        wanted = [code for title, code in codes.items() if title.lower() == value.lower()]
+        if not wanted:
+            return self._empty
+        return np.nonzero(np.isin(doc_codes, wanted))[0].astype(np.int32)
+
+    def facet_counts(self, docs: np.ndarray, volume_filter: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Hit counts per volume of all docs and per book of those in volume_filter, one np.bincount each"""
+        volume_counts = np.bincount(self.doc_volumes[docs], minlength=len(self.volume_codes))
+        book_counts = np.bincount(self.doc_books[self.filter_volume(docs, volume_filter)],
+                                  minlength=len(self.book_codes))
+        return {
+            'volumes': {volume: int(volume_counts[code]) for volume, code in self.volume_codes.items()
+                        if volume_counts[code]},
+            'books': {book: int(book_counts[code]) for book, code in self.book_codes.items()
+                      if book_counts[code]},
+        }
+
+    def filter_volume(self, docs: np.ndarray, volume_filter: Optional[str],
+                      tiers: np.ndarray = None):
+        """Restrict docs (and their matching tiers, when given) to a single volume"""
+        if volume_filter:
+            code = self.volume_codes.get(volume_filter)
+            mask = self.doc_volumes[docs] == code if code is not None else np.zeros(len(docs), dtype=bool)
+            docs = docs[mask]
+            if tiers is not None:
+                tiers = tiers[mask]
+        return docs if tiers is None else (docs, tiers)
+
+    def query_vector(self, terms: List[str]) -> np.ndarray:
+        """Dense query vector over the vocabulary (term counts)"""
+        query = np.zeros(len(self.term_ids), dtype=np.float32)
+        for term in terms:
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                query[term_id] += 1
+        return query
+
+    def score(self, docs: np.ndarray, terms: List[str]) -> np.ndarray:
+        """BM25 scores of docs for the query terms, in one sparse matrix-vector product"""
+        if not len(docs):
+            return np.zeros(0, dtype=np.float32)
+        return self.bm25[docs] @ self.query_vector(terms)
+
+    def _after_mask(self, docs: np.ndarray, scores: np.ndarray, after_score: float, after_id: int) -> np.ndarray:
+        """Which docs rank after a (score, verse id) pagination key: lower score, then higher id"""
+        return (scores < after_score) | ((scores == after_score) & (self.row_ids[docs] > after_id))
+
+    @staticmethod
+    def _select(keys: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k smallest keys, ties at the cut-off going to the lowest documents"""
+        if k >= len(keys):
+            return np.arange(len(keys))
+        # np.argpartition alone would split a tie arbitrarily, so pages could overlap or skip verses
+        kth = np.partition(keys, k - 1)[k - 1]
+        better = np.flatnonzero(keys < kth)
+        ties = np.flatnonzero(keys == kth)
+        ties = ties[np.argsort(docs[ties], kind='stable')[:k - len(better)]]
+        return np.concatenate([better, ties])
+
+    def _top_k(self, docs: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The k best (docs, scores), best score first and ties in document order"""
+        if k < len(docs):
+            top = self._select(-scores, docs, k)
+            docs, scores = docs[top], scores[top]
+        order = np.lexsort((docs, -scores))
+        return docs[order], scores[order]
+
+    def max_score_top_k(self, terms: List[str], k: int, exclude: np.ndarray = None,
+                        volume_filter: Optional[str] = None,
+                        after: Tuple[float, int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k documents containing any term, by BM25, with MaxScore early termination"""
+        term_ids = list(dict.fromkeys(self.term_ids[term] for term in terms if term in self.term_ids))
+        if k <= 0 or not term_ids:
+            return self._empty, np.zeros(0, dtype=np.float32)
+
+        query = self.query_vector(terms)
+        term_ids.sort(key=lambda term_id: -self.max_weights[term_id] * query[term_id])
+        bounds = np.array([self.max_weights[term_id] * query[term_id] for term_id in term_ids])
+        remaining_bounds = np.cumsum(bounds[::-1])[::-1]
+
+        top_docs, top_scores = self._empty, np.zeros(0, dtype=np.float32)
+        seen = exclude if exclude is not None else self._empty
+        for position, term_id in enumerate(term_ids):
+            # Unseen documents hold only the remaining terms; stop once their bounds can't beat the k-th score
+            if len(top_docs) >= k and remaining_bounds[position] <= top_scores[-1]:
+                break
+            term_docs = self._by_term.indices[self._by_term.indptr[term_id]:self._by_term.indptr[term_id + 1]]
+            new_docs = np.setdiff1d(term_docs, seen, assume_unique=True)
+            seen = np.union1d(seen, term_docs)
+            new_docs = self.filter_volume(new_docs, volume_filter)
+            # Full scores over all query terms for the newly reached documents
+            new_scores = self.bm25[new_docs] @ query
+            if after is not None:
+                keep = self._after_mask(new_docs, new_scores, *after)
+                new_docs, new_scores = new_docs[keep], new_scores[keep]
+            if not len(new_docs):
+                continue
+            top_docs, top_scores = self._top_k(np.concatenate([top_docs, new_docs]),
+                                               np.concatenate([top_scores, new_scores]), k)
+        return top_docs, top_scores
+
+    def top_tiered(self, phrase_tokens: List[str], terms: List[str], limit: int,
+                   volume_filter: Optional[str] = None, after: Tuple[int, float, int] = None) -> List[tuple]:
+        """Result rows for the top verses by best match tier (phrase, all terms, any term), then BM25 score"""
+        score_terms = terms or phrase_tokens
+        query = self.query_vector(score_terms)
+        phrase_docs = self.match_phrase(phrase_tokens) if phrase_tokens else self._empty
+        all_docs = np.setdiff1d(self.match_all(terms), phrase_docs, assume_unique=True)
+
+        after_tier = after[0] if after else -1
+
+        rows = []
+        for tier, docs in ((0, phrase_docs), (1, all_docs)):
+            docs = self.filter_volume(docs, volume_filter)
+            if tier < after_tier or len(rows) >= limit or not len(docs):
+                continue
+            scores = self.bm25[docs] @ query
+            if tier == after_tier:
+                keep = self._after_mask(docs, scores, *after[1:])
+                docs, scores = docs[keep], scores[keep]
+            docs, scores = self._top_k(docs, scores, limit - len(rows))
+            rows.extend(self._result_row(doc, tier, score) for doc, score in zip(docs, scores))
+
+        if len(rows) < limit and len(set(terms)) > 1 and after_tier <= 2:
+            exclude = np.union1d(phrase_docs, all_docs)
+            docs, scores = self.max_score_top_k(terms, limit - len(rows), exclude, volume_filter,
+                                                after[1:] if after_tier == 2 else None)
+            rows.extend(self._result_row(doc, 2, score) for doc, score in zip(docs, scores))
+
+        return rows
+
+    def tiered_docs(self, phrase_tokens: List[str], terms: List[str],
+                    volume_filter: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Every document top_tiered pages through, with its match tier, as (docs, tiers)"""
+        phrase_docs = self.match_phrase(phrase_tokens) if phrase_tokens else self._empty
+        all_docs = np.setdiff1d(self.match_all(terms), phrase_docs, assume_unique=True)
+        parts = [phrase_docs, all_docs]
+        if len(set(terms)) > 1:
+            parts.append(np.setdiff1d(self.match_any(terms), np.union1d(phrase_docs, all_docs), assume_unique=True))
+        docs = np.concatenate(parts)
+        tiers = np.repeat(np.arange(len(parts)), [len(part) for part in parts])
+        return self.filter_volume(docs, volume_filter, tiers)
+
+    def ranked(self, docs: np.ndarray, tiers: np.ndarray, terms: List[str],
+               after: Tuple[int, float, int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All of docs after the key after in result order (tier, BM25 score, document) as (docs, tiers, scores)"""
+        scores = self.score(docs, terms)
+        if after is not None:
+            keep = (tiers > after[0]) | ((tiers == after[0]) & self._after_mask(docs, scores, *after[1:]))
+            docs, tiers, scores = docs[keep], tiers[keep], scores[keep]
+        order = np.lexsort((docs, -scores, tiers))
+        return docs[order], tiers[order], scores[order]
+
+    def result_rows(self, docs: np.ndarray, tiers: np.ndarray, scores: np.ndarray) -> List[tuple]:
+        """Result rows (result columns, tier, score, verse id) for ranked documents"""
+        return [self._result_row(doc, tier, score) for doc, tier, score in zip(docs, tiers, scores)]
+
+    def _result_row(self, doc: int, tier: int, score: float) -> tuple:
+        return self.rows[doc] + (int(tier), float(score), int(self.row_ids[doc]))
+
+    def top_rows(self, docs: np.ndarray, tiers: np.ndarray, terms: List[str], limit: int,
+                 after: Tuple[int, float, int] = None) -> List[tuple]:
+        """Result rows for the top-k documents by best tier, then BM25 score, after the key after"""
+        if limit <= 0 or not len(docs):
+            return []
+        scores = self.score(docs, terms)
+        if after is not None:
+            keep = (tiers > after[0]) | ((tiers == after[0]) & self._after_mask(docs, scores, *after[1:]))
+            docs, tiers, scores = docs[keep], tiers[keep], scores[keep]
+            if not len(docs):
+                return []
+
+        # Tier dominates: scores are non-negative, so offset each tier past the best score
+        keys = tiers.astype(np.float64) * (float(scores.max()) + 1.0) - scores
+        top = self._select(keys, docs, limit)
+        top = top[np.lexsort((docs[top], keys[top]))]
+        return [self._result_row(doc, tier, score) for doc, tier, score in zip(docs[top], tiers[top], scores[top])]
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, or max_distance + 1 as soon as it must exceed max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+def trigrams(term: str) -> List[str]:
+    """Character trigrams of term, padded so word starts and ends count"""
+    padded = f'^{term}$'
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+class TermDictionary:
+    """Sorted vocabulary with document frequencies plus book-name aliases, for prefix lookups"""
+
+    MAX_CORRECTION_CANDIDATES = 200
+
+    def __init__(self, term_freqs: Iterable[Tuple[str, int]], book_aliases: Dict[str, str] = None):
+        entries = sorted(term_freqs)
+        self.terms = [term for term, _ in entries]
+        self.doc_freqs = np.array([freq for _, freq in entries], dtype=np.int32)
+        aliases = sorted((book_aliases or {}).items())
+        self.aliases = [alias for alias, _ in aliases]
+        self.alias_books = [book for _, book in aliases]
+        self._trigram_index = None
+
+    @classmethod
+    def from_index(cls, index: ScriptureIndex, book_aliases: Dict[str, str] = None) -> 'TermDictionary':
+        """Vocabulary of an in-memory index"""
+        return cls(((term, int(index.doc_freqs[term_id])) for term, term_id in index.term_ids.items()),
+                   book_aliases)
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, book_aliases: Dict[str, str] = None) -> 'TermDictionary':
+        """Vocabulary of the SQLite FTS5 index, read through its fts5vocab table"""
+        cursor = conn.execute('SELECT term, doc FROM scriptures_fts_vocab')
+        return cls(cursor, book_aliases)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _prefix_range(self, keys: List[str], prefix: str) -> Tuple[int, int]:
+        """Slice of sorted keys that start with prefix"""
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + '\U0010ffff')
+
+    def complete_term(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Most frequent terms starting with prefix, as (term, document frequency)"""
+        low, high = self._prefix_range(self.terms, prefix)
+        if low >= high or limit <= 0:
+            return []
+        freqs = self.doc_freqs[low:high]
+        if limit < len(freqs):
+            top = np.argpartition(-freqs, limit - 1)[:limit]
+        else:
+            top = np.arange(len(freqs))
+        top = top[np.lexsort((top, -freqs[top]))]
+        return [(self.terms[low + i], int(freqs[i])) for i in top]
+
+    def complete_book(self, prefix: str, limit: int = 10) -> List[str]:
+        """Book names with an alias starting with prefix"""
+        low, high = self._prefix_range(self.aliases, prefix)
+        books = []
+        for book in self.alias_books[low:high]:
+            if book not in books:
+                books.append(book)
+                if len(books) >= limit:
+                    break
+        return books
+
+    def suggest(self, prefix: str, limit: int = 10) -> Dict:
+        """Book names matching the prefix and completions of its last word"""
+        prefix = prefix.lower().lstrip()
+        words = tokenize(prefix)
+        completions = []
+        head = prefix[:len(prefix) - len(words[-1])] if words and prefix.endswith(words[-1]) else None
+        # Only complete a whole word being typed, not the tail of something like "d&c"
+        if head is not None and (not head or head[-1].isspace()):
+            completions = [
+                {'suggestion': head + term, 'term': term, 'doc_freq': freq}
+                for term, freq in self.complete_term(words[-1], limit)
+            ]
+        return {
+            'prefix': prefix,
+            'books': self.complete_book(prefix.strip(), limit) if prefix.strip() else [],
+            'terms': completions,
+        }
+
+    def __contains__(self, term: str) -> bool:
+        position = bisect_left(self.terms, term)
+        return position < len(self.terms) and self.terms[position] == term
+
+    def _build_trigram_index(self):
+        """Character-trigram postings over the vocabulary: trigram -> int32 term numbers"""
+        gram_terms = {}
+        for term_number, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                gram_terms.setdefault(gram, []).append(term_number)
+        self._trigram_index = {gram: np.array(numbers, dtype=np.int32) for gram, numbers in gram_terms.items()}
+        self._term_lengths = np.array([len(term) for term in self.terms], dtype=np.int32)
+
+    def corrections(self, word: str, max_distance: int = 2, limit: int = 3) -> List[Tuple[str, int]]:
+        """Vocabulary terms within max_distance edits of word as (term, distance), closest then most frequent first"""
+        if self._trigram_index is None:
+            self._build_trigram_index()
+        grams = trigrams(word)
+        lists = [self._trigram_index[gram] for gram in grams if gram in self._trigram_index]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.terms))
+        required = max(1, len(grams) - 4 * max_distance)
+        candidates = np.nonzero((shared >= required)
+                                & (np.abs(self._term_lengths - len(word)) <= max_distance))[0]
+        # Most promising first; a bounded number of edit-distance checks per word
+        candidates = candidates[np.argsort(-shared[candidates], kind='stable')][:self.MAX_CORRECTION_CANDIDATES]
+
+        matches = []
+        for term_number in candidates:
+            distance = edit_distance(word, self.terms[term_number], max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -int(self.doc_freqs[term_number]), self.terms[term_number]))
+        matches.sort()
+        return [(term, distance) for distance, _, term in matches[:limit]]
+
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Boolean query language for scripture search
+Phrases, AND / OR / NOT, -exclusions, NEAR/n and volume:/book: filters, evaluated in memory or compiled to SQL
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<near>NEAR/(?P<distance>\d+))
+  | (?P<field>(?:volume|book):(?:"[^"]*"?|[^\s()"]+))
+  | (?P<minus>-)(?=["\w])
+  | (?P<phrase>"[^"]*"?)
+  | (?P<word>[^\s()"]+)
+''', re.VERBOSE | re.IGNORECASE)
+
+# Queries using any of these go through the query language instead of the tiered search
+ADVANCED_QUERY_PATTERN = re.compile(
+    r'"|\(|\b(?:AND|OR|NOT)\b|(?:^|\s)-["\w]|\b(?:volume|book):', re.IGNORECASE)
+BOOLEAN_OPERATORS = ('AND', 'OR', 'NOT')
+
+@dataclass
+class Term:
+    word: str
+
+@dataclass
+class Phrase:
+    words: List[str]
+
+@dataclass
+class Near:
+    left: List[str]
+    right: List[str]
+    distance: int
+
+@dataclass
+class Field:
+    name: str
+    value: str
+
+@dataclass
+class Not:
+    child: object
+
+@dataclass
+class And:
+    children: List[object] = field(default_factory=list)
+
+@dataclass
+class Or:
+    children: List[object] = field(default_factory=list)
+
+def is_advanced_query(query: str) -> bool:
+    """Check whether a query uses the boolean query syntax"""
+    for match in ADVANCED_QUERY_PATTERN.finditer(query):
+        text = match.group(0).strip()
+        # Operators only count in upper case, so "not" and "or" stay ordinary words
+        if text.upper() not in BOOLEAN_OPERATORS or text in BOOLEAN_OPERATORS:
+            return True
+    return False
+
+def _words(text: str) -> List[str]:
+    return re.findall(r'\w+', text.lower())
+
+def _lex(query: str) -> List[Tuple[str, str]]:
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(query):
+        for name in ('lparen', 'rparen', 'near', 'field', 'minus', 'phrase', 'word'):
+            if match.group(name) is not None:
+                kind = name
+                break
+        value = match.group(0)
+        if kind == 'word' and value in BOOLEAN_OPERATORS:
+            kind = value.lower()
+        elif kind == 'near':
+            value = match.group('distance')
+        tokens.append((kind, value))
+    return tokens
+
+class _Parser:
+    """Recursive-descent parser; lenient about unbalanced quotes and parentheses"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'or':
+            self.take()
+            children.append(self.parse_and())
+        children = [child for child in children if child is not None]
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = []
+        while self.peek() not in (None, 'or', 'rparen'):
+            if self.peek() == 'and':
+                self.take()
+                continue
+            child = self.parse_unary()
+            if child is not None:
+                children.append(child)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self):
+        if self.peek() in ('not', 'minus'):
+            self.take()
+            child = self.parse_unary()
+            return Not(child) if child is not None else None
+        return self.parse_near()
+
+    def parse_near(self):
+        left = self.parse_primary()
+        while self.peek() == 'near':
+            distance = int(self.take()[1])
+            right = self.parse_primary()
+            left_words, right_words = _near_operand(left), _near_operand(right)
+            if left_words and right_words:
+                left = Near(left_words, right_words, distance)
+            else:
+                left = left or right
+        return left
+
+    def parse_primary(self):
+        kind = self.peek()
+        if kind is None:
+            return None
+        kind, value = self.take()
+        if kind == 'lparen':
+            node = self.parse_or()
+            if self.peek() == 'rparen':
+                self.take()
+            return node
+        if kind == 'field':
+            name, _, text = value.partition(':')
+            text = text.strip('"').strip()
+            return Field(name.lower(), text) if text else None
+        if kind in ('rparen', 'near'):
+            return None
+        words = _words(value)
+        if not words:
+            return None
+        return Term(words[0]) if len(words) == 1 else Phrase(words)
+
+def _near_operand(node) -> Optional[List[str]]:
+    if isinstance(node, Term):
+        return [node.word]
+    if isinstance(node, Phrase):
+        return node.words
+    return None
+
+def parse_query(query: str):
+    """Parse a query into a tree of Term/Phrase/Near/Field/Not/And/Or nodes (None if empty)"""
+    return _Parser(_lex(query)).parse_or()
+
+def positive_words(node) -> List[str]:
+    """Words that count towards relevance: every searched word not under a NOT"""
+    if isinstance(node, Term):
+        return [node.word]
+    if isinstance(node, Phrase):
+        return list(node.words)
+    if isinstance(node, Near):
+        return node.left + node.right
+    if isinstance(node, (And, Or)):
+        return [word for child in node.children for word in positive_words(child)]
+    return []
+
+def map_fields(node, name: str, function):
+    """Rewrite the values of every Field called name (e.g. to canonical book names)"""
+    if isinstance(node, Field) and node.name == name:
+        return Field(name, function(node.value))
+    if isinstance(node, Not):
+        return Not(map_fields(node.child, name, function))
+    if isinstance(node, (And, Or)):
+        return type(node)([map_fields(child, name, function) for child in node.children])
+    return node
+
+def map_words(node, function):
+    """Rewrite every searched word not under a NOT (e.g. to spelling corrections)"""
+    if isinstance(node, Term):
+        return Term(function(node.word))
+    if isinstance(node, Phrase):
+        return Phrase([function(word) for word in node.words])
+    if isinstance(node, Near):
+        return Near([function(word) for word in node.left], [function(word) for word in node.right], node.distance)
+    if isinstance(node, (And, Or)):
+        return type(node)([map_words(child, function) for child in node.children])
+    return node
+
+def _format_operand(node) -> str:
+    text = format_query(node)
+    return f'({text})' if isinstance(node, (And, Or)) else text
+
+def format_query(node) -> str:
+    """Write a query tree back out as a query string that parses to the same tree"""
+    if isinstance(node, Term):
+        return node.word
+    if isinstance(node, Phrase):
+        return '"' + ' '.join(node.words) + '"'
+    if isinstance(node, Near):
+        left, right = (' '.join(words) if len(words) == 1 else '"' + ' '.join(words) + '"'
+                       for words in (node.left, node.right))
+        return f'{left} NEAR/{node.distance} {right}'
+    if isinstance(node, Field):
+        return f'{node.name}:"{node.value}"'
+    if isinstance(node, Not):
+        return 'NOT ' + _format_operand(node.child)
+    joiner = ' ' if isinstance(node, And) else ' OR '
+    return joiner.join(_format_operand(child) for child in node.children)
+
+def evaluate(node, index) -> np.ndarray:
+    """Sorted document numbers of a ScriptureIndex matching the query tree"""
+    if isinstance(node, Term):
+        return index.postings_for(node.word)
+    if isinstance(node, Phrase):
+        return index.match_phrase(node.words)
+    if isinstance(node, Near):
+        return index.match_near(node.left, node.right, node.distance)
+    if isinstance(node, Field):
+        return index.match_field(node.name, node.value)
+    if isinstance(node, Not):
+        return np.setdiff1d(index.all_docs(), evaluate(node.child, index), assume_unique=True)
+    if isinstance(node, Or):
+        return np.unique(np.concatenate([evaluate(child, index) for child in node.children]))
+    if isinstance(node, And):
+        # Exclusions become set differences against the positive part
+        included = [child for child in node.children if not isinstance(child, Not)]
+        excluded = [child.child for child in node.children if isinstance(child, Not)]
+        if included:
+            docs = evaluate(included[0], index)
+            for child in included[1:]:
+                if not len(docs):
+                    break
+                docs = np.intersect1d(docs, evaluate(child, index), assume_unique=True)
+        else:
+            docs = index.all_docs()
+        for child in excluded:
+            if not len(docs):
+                break
+            docs = np.setdiff1d(docs, evaluate(child, index), assume_unique=True)
+        return docs
+    return index.all_docs()[:0]
+
+def _is_text_only(node) -> bool:
+    if isinstance(node, (Term, Phrase, Near)):
+        return True
+    if isinstance(node, (And, Or)):
+        return all(_is_text_only(child) for child in node.children)
+    return False
+
+def _fts_expression(node) -> str:
+    if isinstance(node, Term):
+        return f'"{node.word}"'
+    if isinstance(node, Phrase):
+        return '"' + ' '.join(node.words) + '"'
+    if isinstance(node, Near):
+        return f'NEAR("{" ".join(node.left)}" "{" ".join(node.right)}", {node.distance})'
+    joiner = ' AND ' if isinstance(node, And) else ' OR '
+    return '(' + joiner.join(_fts_expression(child) for child in node.children) + ')'
+
+def compile_sql(node, use_fts: bool, alias: str = 's') -> Tuple[str, list]:
+    """Compile a query tree to an SQL condition on the scriptures table (aliased as alias)"""
+    if isinstance(node, Field):
+        return f'{alias}.{node.name} = ?', [node.value]
+    if use_fts and _is_text_only(node):
+        return (f'{alias}.id IN (SELECT rowid FROM scriptures_fts WHERE scriptures_fts MATCH ?)',
+                [_fts_expression(node)])
+    if isinstance(node, Term):
+        return f'LOWER({alias}.text) LIKE ?', [f'%{node.word}%']
+    if isinstance(node, Phrase):
+        return f'LOWER({alias}.text) LIKE ?', ['%' + ' '.join(node.words) + '%']
+    if isinstance(node, Near):
+        # Without positions, proximity degrades to requiring all of the words
+        return compile_sql(And([Term(word) for word in node.left + node.right]), use_fts, alias)
+    if isinstance(node, Not):
+        sql, params = compile_sql(node.child, use_fts, alias)
+        return f'NOT ({sql})', params
+    joiner = ' AND ' if isinstance(node, And) else ' OR '
+    parts = [compile_sql(child, use_fts, alias) for child in node.children]
+    return '(' + joiner.join(sql for sql, _ in parts) + ')', [param for _, params in parts for param in params]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Semantic (topical) search over the scriptures table
+LSA verse vectors built locally from the corpus, searched by nearest neighbour in a faiss index
+"""
+
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import faiss
+import numpy as np
+from threadpoolctl import threadpool_limits
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+# Words so common in the KJV that they say nothing about a verse's topic
+ARCHAIC_STOP_WORDS = frozenset({
+    'thee', 'thou', 'thy', 'thine', 'ye', 'unto', 'shall', 'hath', 'doth', 'saith',
+    'shalt', 'art', 'hast', 'wilt', 'yea', 'behold', 'lo', 'came', 'pass',
+})
+
+def nearest_neighbors(vectors: np.ndarray, n: int, block_size: int = 256,
+                      workers: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """The n most similar other rows of vectors for every row, exactly, by blocked matrix multiplication"""
+    count = len(vectors)
+    n = max(0, min(n, count - 1))
+    neighbors = np.zeros((count, n), dtype=np.int32)
+    similarities = np.zeros((count, n), dtype=np.float32)
+    if not n:
+        return neighbors, similarities
+
+    def run_block(start: int):
+        block = vectors[start:start + block_size] @ vectors.T
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf  # a verse is not its own neighbour
+        top = np.argpartition(-block, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        neighbors[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        similarities[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+
+    with threadpool_limits(limits=1, user_api='blas'):
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            list(pool.map(run_block, range(0, count, block_size)))
+    return neighbors, similarities
+
+class SemanticIndex:
+    """L2-normalized LSA verse vectors with a faiss inner-product (cosine) index over them"""
+
+    DIMENSIONS = 256
+    # Cosine similarity below which a verse isn't considered related at all
+    MIN_SIMILARITY = 0.1
+    IVF_MIN_VERSES = 10000
+    NPROBE = 16
+
+    def __init__(self, rows: Iterable[tuple], dimensions: int = DIMENSIONS):
+        """Build from (id, volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url) rows"""
+        rows = list(rows)
+        self.rows = [tuple(row[1:]) for row in rows]
+        self.row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.volume_codes = {}
+        self.doc_volumes = np.array([self.volume_codes.setdefault(row[1], len(self.volume_codes)) for row in rows],
+                                    dtype=np.int32)
+        self._selectors = {}
+
+        self.vectorizer = TfidfVectorizer(
+            token_pattern=r'\w+', sublinear_tf=True, max_df=0.5,
+            stop_words=list(ENGLISH_STOP_WORDS | ARCHAIC_STOP_WORDS))
+        tfidf = self.vectorizer.fit_transform(row[5] for row in rows)
+        self.svd = TruncatedSVD(n_components=max(1, min(dimensions, tfidf.shape[1] - 1)), random_state=0)
+        self.vectors = self._normalize(self.svd.fit_transform(tfidf))
+
+        dimensions = self.vectors.shape[1]
+        if len(rows) >= self.IVF_MIN_VERSES:
+            quantizer = faiss.IndexFlatIP(dimensions)
+            self.index = faiss.IndexIVFFlat(quantizer, dimensions, int(np.sqrt(len(rows))),
+                                            faiss.METRIC_INNER_PRODUCT)
+            self.index.train(self.vectors)
+            self.index.nprobe = self.NPROBE
+            self._quantizer = quantizer  # the IVF index doesn't keep it alive
+        else:
+            self.index = faiss.IndexFlatIP(dimensions)
+        self.index.add(self.vectors)
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection, **kwargs) -> 'SemanticIndex':
+        """Vectorize every verse in the scriptures table"""
+        cursor = conn.execute('''
+            SELECT id, volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
+            FROM scriptures ORDER BY id
+        ''')
+        return cls(cursor, **kwargs)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """LSA vector of text as a 1 x d matrix, or None when it has no known words"""
+        tfidf = self.vectorizer.transform([text])
+        if not tfidf.nnz:
+            return None
+        return self._normalize(self.svd.transform(tfidf))
+
+    def _search_params(self, volume_filter: Optional[str]):
+        if not volume_filter:
+            return None
+        if volume_filter not in self._selectors:
+            code = self.volume_codes.get(volume_filter, -1)
+            docs = np.flatnonzero(self.doc_volumes == code).astype(np.int64)
+            self._selectors[volume_filter] = (docs, faiss.IDSelectorBatch(docs))
+        docs, selector = self._selectors[volume_filter]
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.NPROBE), len(docs)
+        return faiss.SearchParameters(sel=selector), len(docs)
+
+    def search(self, query: str, k: int, volume_filter: Optional[str] = None,
+               after: Tuple[float, int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The k verses (document numbers, similarities) nearest to query after the key after, best first"""
+        vector = self.embed(query)
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if vector is None or k <= 0:
+            return empty
+        params, candidates = self._search_params(volume_filter) or (None, len(self.rows))
+        if not candidates:
+            return empty
+
+        fetch = k
+        while True:
+            fetch = min(fetch, candidates)
+            scores, docs = self.index.search(vector, fetch, params=params)
+            found = docs[0] >= 0
+            all_scores, all_docs = scores[0][found], docs[0][found]
+            keep = all_scores >= self.MIN_SIMILARITY
+            if after is not None:
+                keep &= (all_scores < after[0]) | ((all_scores == after[0]) & (self.row_ids[all_docs] > after[1]))
+            scores, docs = all_scores[keep], all_docs[keep]
+            # Nothing better is left unfetched once the search returned fewer than
+            # asked for, or reached unrelated verses
+            if len(all_docs) < fetch or all_scores[-1] < self.MIN_SIMILARITY:
+                break
+            # Verses tied with the k-th best may lie past the fetched ones; only a
+            # strictly lower last score guarantees ties are broken by verse id
+            if len(docs) >= k and -np.partition(-scores, k - 1)[k - 1] > all_scores[-1]:
+                break
+            if fetch >= candidates:
+                break
+            fetch *= 4
+
+        order = np.lexsort((self.row_ids[docs], -scores))[:k]
+        return docs[order], scores[order]
+
+    def stats(self) -> Dict:
+        return {
+            'verses': len(self.rows),
+            'dimensions': int(self.vectors.shape[1]),
+            'index': type(self.index).__name__,
+        }
+
+def main():
+    """Precompute the verse_neighbors table behind /similar: python semantic_search.py [db_path] [neighbors]"""
+    from simple_scripture_search import SimpleScriptureSearch
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'simple_scriptures.db'
+    neighbors = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    SimpleScriptureSearch(db_path).build_verse_neighbors(neighbors)
+
+if __name__ == "__main__":
+    main()
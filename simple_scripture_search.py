@@ -4,14 +4,31 @@ Simple Scripture Search - No External AI Dependencies
 Uses only built-in Python libraries and pandas for basic text search
 """
 
+import base64
+import copy
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
 import sqlite3
+import threading
+import numpy as np
 import pandas as pd
 import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional
 import math
 
+from concordance import (count_words, lookup as concordance_lookup, merge_counts, rebuild_concordance,
+                         update_concordance)
+from query_cache import QueryCache, normalize_query
+from scripture_query import (Near, Phrase, compile_sql, evaluate as evaluate_query, format_query,
+                             is_advanced_query, map_fields, map_words, parse_query, positive_words)
+
 @dataclass
 class ScriptureVerse:
     book: str
@@ -24,10 +41,48 @@ class ScriptureVerse:
     verse_id: int = None
     lds_url: str = None
 
+# Reference query shapes: "Book Chapter:Verse", "Book Chapter", "Book Chapter-Chapter", "1 Nephi 1"
+REFERENCE_QUERY_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^\w+.*?\s+\d+:\d+',
+    r'^\w+.*?\s+\d+$',
+    r'^\w+.*?\s+\d+-\d+$',
+    r'^\d+\s+\w+.*?\s+\d+',
+)]
+
+# Full references, most specific first: "Alma 32:21-33:5", "John 3:16-17", "John 3:16",
+# "Matthew 5-7", "John 3"
+REFERENCE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'^(?P<book>.+?)\s+(?P<chapter>\d+):(?P<verse_start>\d+)-(?P<chapter_end>\d+):(?P<verse_end>\d+)$',
+    r'^(?P<book>.+?)\s+(?P<chapter>\d+):(?P<verse_start>\d+)-(?P<verse_end>\d+)$',
+    r'^(?P<book>.+?)\s+(?P<chapter>\d+):(?P<verse>\d+)$',
+    r'^(?P<book>.+?)\s+(?P<chapter>\d+)-(?P<chapter_end>\d+)$',
+    r'^(?P<book>.+?)\s+(?P<chapter>\d+)$',
+)]
+
+# Reference lists: "John 3:16; Rom 8:28", one per line, or "John 3:16; 4:24" continuing a book
+REFERENCE_SEPARATOR = re.compile(r'\s*[;\n]\s*')
+CONTINUATION_PATTERN = re.compile(r'^\d+(?::\d+)?(?:-\d+(?::\d+)?)?$')
+
+# Spelled-out and roman ordinals of numbered books ("First Nephi", "II Kings")
+ORDINAL_PATTERN = re.compile(r'^(first|second|third|fourth|1st|2nd|3rd|4th|iv|iii|ii|i)\s+(?=\w)')
+ORDINALS = {'first': '1', 'second': '2', 'third': '3', 'fourth': '4', '1st': '1', '2nd': '2', '3rd': '3',
+            '4th': '4', 'i': '1', 'ii': '2', 'iii': '3', 'iv': '4'}
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+# Generated prefix aliases need this many characters, two of them letters ("gen", "1 ne")
+MIN_PREFIX_LENGTH = 3
+
+def book_key(name: str) -> str:
+    """Lookup key of a book name or alias: lower case, ordinals as digits, no spaces or punctuation"""
+    name = ORDINAL_PATTERN.sub(lambda match: ORDINALS[match.group(1)] + ' ', name.lower().strip())
+    name = name.replace('&', ' and ')
+    return NON_WORD_PATTERN.sub('', name)
+
 class ScriptureReferenceParser:
     """Simple parser for scripture references like 'John 3:16', '1 Nephi 1:1-10', etc."""
     
-    def __init__(self):
+    def __init__(self, books: Iterable[tuple] = ()):
+        """books are (title, short title) pairs, e.g. ('1 Nephi', '1 Ne.'), from the books table"""
         # Basic book name mappings for common abbreviations
         self.book_mappings = {
             # Bible - New Testament
@@ -70,27 +125,39 @@ class ScriptureReferenceParser:
             # Doctrine and Covenants
             'dc': 'Doctrine and Covenants', 'd&c': 'Doctrine and Covenants', 'dnc': 'Doctrine and Covenants',
             'doctrine and covenants': 'Doctrine and Covenants',
-\
+
             # Pearl of Great Price
             'moses': 'Moses', 'abr': 'Abraham', 'abraham': 'Abraham',
             'jsm': 'Joseph Smith—Matthew', 'js-m': 'Joseph Smith—Matthew',
             'jsh': 'Joseph Smith—History', 'js-h': 'Joseph Smith—History',
         }
+        for title, short_title in books:
+            self.book_mappings[title.lower()] = title
+            if short_title:
+                self.book_mappings[short_title.lower().rstrip('.')] = title
+        self.alias_index = self._build_alias_index()
+    
+    def _build_alias_index(self) -> Dict[str, str]:
+        """Hash map from book_key() of every alias, and of every unambiguous prefix of a book name, to the book"""
+        prefix_books = {}
+        for book in set(self.book_mappings.values()):
+            key = book_key(book)
+            for end in range(MIN_PREFIX_LENGTH, len(key)):
+                prefix = key[:end]
+                if len(prefix.lstrip('0123456789')) >= 2:
+                    prefix_books.setdefault(prefix, set()).add(book)
+        alias_index = {prefix: books.pop() for prefix, books in prefix_books.items() if len(books) == 1}
+        # Explicit aliases and full names win over generated prefixes
+        for alias, book in self.book_mappings.items():
+            alias_index[book_key(alias)] = book
+        for book in set(self.book_mappings.values()):
+            alias_index[book_key(book)] = book
+        return alias_index
     
     def is_reference_query(self, query):
         """Check if a query looks like a scripture reference"""
-        import re
-        # Look for patterns like "Book Chapter:Verse" or "Book Chapter"
-        patterns = [
-            r'^\w+.*?\s+\d+:\d+',      # Book Chapter:Verse
-            r'^\w+.*?\s+\d+$',         # Book Chapter
-            r'^\d+\s+\w+.*?\s+\d+',    # Number Book Chapter (e.g., "1 Nephi 1")
-        ]
-        
-        for pattern in patterns:
-            if re.match(pattern, query.strip(), re.IGNORECASE):
-                return True
-        return False
+        query = query.strip()
+        return any(pattern.match(query) for pattern in REFERENCE_QUERY_PATTERNS)
     
     def parse_reference(self, reference):
         """
@@ -100,75 +167,227 @@ class ScriptureReferenceParser:
         - "John 3:16" -> [{'book': 'John', 'chapter': 3, 'verse': 16}]
         - "1 Nephi 1" -> [{'book': '1 Nephi', 'chapter': 1}]
         - "Alma 32:21-23" -> [{'book': 'Alma', 'chapter': 32, 'verse_start': 21, 'verse_end': 23}]
+        - "Alma 32:21-33:5" -> [{'book': 'Alma', 'chapter': 32, 'verse_start': 21, 'chapter_end': 33, 'verse_end': 5}]
+        - "Matthew 5-7" -> [{'book': 'Matthew', 'chapter': 5, 'chapter_end': 7}]
         """
-        import re
         reference = reference.strip()
         
-        # Try different reference patterns
-        patterns = [
-            # Pattern: "Book Chapter:Verse-Verse" (e.g., "John 3:16-17")
-            r'^(.+?)\s+(\d+):(\d+)-(\d+)$',
-            # Pattern: "Book Chapter:Verse" (e.g., "John 3:16")
-            r'^(.+?)\s+(\d+):(\d+)$',
-            # Pattern: "Book Chapter" (e.g., "John 3")
-            r'^(.+?)\s+(\d+)$',
-        ]
-        
-        for pattern in patterns:
-            match = re.match(pattern, reference, re.IGNORECASE)
+        for pattern in REFERENCE_PATTERNS:
+            match = pattern.match(reference)
             if match:
-                groups = match.groups()
-                book_name = groups[0].strip()
-                
                 # Normalize book name
-                normalized_book = self.normalize_book_name(book_name)
+                normalized_book = self.normalize_book_name(match.group('book').strip())
                 if not normalized_book:
                     continue
                 
                 result = {'book': normalized_book}
+                result.update((name, int(value)) for name, value in match.groupdict().items()
+                              if name != 'book' and value is not None)
                 
-                if len(groups) >= 2:  # Has chapter
-                    result['chapter'] = int(groups[1])
-                
-                if len(groups) >= 3:  # Has verse
-                    result['verse'] = int(groups[2])
-                
-                if len(groups) >= 4:  # Has verse range
-                    result['verse_start'] = int(groups[2])
-                    result['verse_end'] = int(groups[3])
-                    del result['verse']  # Remove single verse
+                # "Alma 32:21-32:25" is an ordinary verse range
+                if result.get('chapter_end') == result['chapter'] and 'verse_start' in result:
+                    del result['chapter_end']
                 
                 return [result]
         
         return []
     
+    def parse_references(self, text: str) -> List[tuple]:
+        """Every reference in a list like "John 3:16; Rom 8:28; 4:24" as (text, parameters, None for a non-reference)"""
+        references = []
+        book = None
+        for part in REFERENCE_SEPARATOR.split(text.strip()):
+            if not part:
+                continue
+            if book and CONTINUATION_PATTERN.match(part):
+                reference_params_list = self.parse_reference(f"{book} {part}")
+            else:
+                reference_params_list = self.parse_reference(part)
+            reference_params = reference_params_list[0] if reference_params_list else None
+            if reference_params:
+                book = reference_params['book']
+            references.append((part, reference_params))
+        return references
+    
     def normalize_book_name(self, book_name):
-        """Normalize book name using mappings"""
-        book_lower = book_name.lower().strip()
-        
-        # Direct mapping
-        if book_lower in self.book_mappings:
-            return self.book_mappings[book_lower]
-        
-        # Try without spaces/punctuation
-        book_clean = re.sub(r'[^\w]', '', book_lower)
-        if book_clean in self.book_mappings:
-            return self.book_mappings[book_clean]
-        
-        # Try partial matches for longer names
-        for abbrev, full_name in self.book_mappings.items():
-            if book_lower == full_name.lower():
-                return full_name
-        
-        return None
+        """Canonical name of a book from any alias, abbreviation or unambiguous prefix, or None"""
+        return self.alias_index.get(book_key(book_name))
+    
+# CSV columns load_csv_file() needs; volume_id, book_id, verse_id, book_lds_url
+# and book_short_title are optional
+CSV_REQUIRED_COLUMNS = ['volume_title', 'book_title', 'chapter_number', 'verse_number', 'scripture_text']
+# Columns of a cleaned verse frame, in scriptures table order
+VERSE_COLUMNS = ['volume', 'book', 'chapter', 'verse', 'text', 'volume_id', 'book_id', 'verse_id', 'lds_url']
+# Columns sync_csv_file() compares to detect a changed verse; the rest of VERSE_COLUMNS is its key
+CONTENT_COLUMNS = ['text', 'volume_id', 'book_id', 'verse_id', 'lds_url']
+# Connection settings while a bulk load runs (see SimpleScriptureSearch._bulk_load)
+BULK_LOAD_PRAGMAS = {'synchronous': 'OFF', 'cache_size': -65536, 'temp_store': 'MEMORY'}
+# Rows of a CSV file read, cleaned and inserted at a time
+CSV_CHUNK_SIZE = 20000
+
+def _optional_column(df: pd.DataFrame, column: str) -> pd.Series:
+    return df[column] if column in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+def _optional_ints(values: pd.Series) -> pd.Series:
+    numbers = np.trunc(pd.to_numeric(values, errors='coerce')).astype('Int64')
+    return numbers.astype(object).where(numbers.notna(), None)
+
+def _optional_strings(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.strip().where(values.notna(), None)
+
+def content_hashes(frame: pd.DataFrame) -> List[int]:
+    """Signed 64-bit hash of each row's CONTENT_COLUMNS, as stored in scriptures.content_hash"""
+    # Hashed as text so ints and None hash alike whatever dtype pandas gave the column
+    hashes = pd.util.hash_pandas_object(frame[CONTENT_COLUMNS].astype(str), index=False)
+    return hashes.to_numpy().view(np.int64).tolist()
+
+def clean_scripture_frame(df: pd.DataFrame) -> tuple:
+    """Clean the rows of a scriptures CSV column-wise: (verse frame of SQL-ready values, labels of invalid rows)"""
+    chapters = pd.to_numeric(df['chapter_number'], errors='coerce')
+    verses = pd.to_numeric(df['verse_number'], errors='coerce')
+    valid = chapters.notna() & verses.notna()
+    df = df[valid]
+    frame = pd.DataFrame({
+        'volume': df['volume_title'].astype(str).str.strip(),
+        'book': df['book_title'].astype(str).str.strip(),
+        'chapter': chapters[valid].astype('int64').astype(object),
+        'verse': verses[valid].astype('int64').astype(object),
+        'text': df['scripture_text'].astype(str).str.strip(),
+        'volume_id': _optional_ints(_optional_column(df, 'volume_id')),
+        'book_id': _optional_ints(_optional_column(df, 'book_id')),
+        'verse_id': _optional_ints(_optional_column(df, 'verse_id')),
+        'lds_url': _optional_strings(_optional_column(df, 'book_lds_url')),
+        'short_title': _optional_strings(_optional_column(df, 'book_short_title')),
+    })
+    frame['content_hash'] = content_hashes(frame)
+    return frame, list(valid.index[~valid])
+
+def prepare_csv_chunk(chunk: pd.DataFrame) -> tuple:
+    """Clean a chunk of a scriptures CSV and count its words: (verse frame, invalid row labels, word counts)"""
+    frame, invalid = clean_scripture_frame(chunk)
+    # Keep the first row of each verse, as INSERT OR IGNORE would, so the counts match what gets inserted
+    frame = frame.drop_duplicates(['book', 'chapter', 'verse', 'volume'])
+    return frame, invalid, count_words(zip(frame['volume'], frame['book'], frame['text']))
+
+# Keeps the full-text index in step with inserts; bulk loads swap it for one INSERT ... SELECT
+FTS_INSERT_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS scriptures_fts_insert AFTER INSERT ON scriptures BEGIN
+        INSERT INTO scriptures_fts(rowid, text) VALUES (new.id, new.text);
+    END
+'''
+
+# Upper bound for "the whole chapter" in verse ranges
+LAST_VERSE = 1 << 30
+
+# Columns returned for every verse result, in the order _row_to_result expects
+RESULT_COLUMNS = 'volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url'
+
+# Text match tiers, best first, and the fixed score reported for each.
+# 'proximity' tags results of NEAR/n queries, 'boolean' results of the
+# query language (see scripture_query) and 'semantic' results of semantic
+# mode; none of them has other tiers.
+MATCH_TIERS = ('exact_phrase', 'all_words', 'any_word', 'proximity', 'boolean', 'semantic')
+TIER_SCORES = (100, 80, 60, 90, 90, 50)
+PROXIMITY_TIER = 3
+BOOLEAN_TIER = 4
+SEMANTIC_TIER = 5
+
+# search_text modes: 'keyword' matches words, 'semantic' finds verses on the same topic
+SEARCH_MODES = ('keyword', 'semantic')
+
+# Markers around matches in FTS5 highlight() output; control characters never occur in verse text
+HIGHLIGHT_MARKERS = re.compile('[\x01\x02]')
+
+def make_snippet(text: str, highlights: List[tuple], length: int = 200) -> tuple:
+    """(snippet, shifted highlights): about length characters of text around its densest run of highlights"""
+    if len(text) <= length:
+        return text, list(highlights)
+    
+    # Start the window at the highlight that has the most others within length of it
+    first, best, end_index = 0, 0, 0
+    for index, (start, _) in enumerate(highlights):
+        end_index = max(end_index, index)
+        while end_index + 1 < len(highlights) and highlights[end_index + 1][1] <= start + length:
+            end_index += 1
+        if end_index - index + 1 > best:
+            first, best = start, end_index - index + 1
+    
+    start = max(0, min(first - length // 4, len(text) - length))
+    if start > 0:
+        start = text.rfind(' ', 0, start) + 1
+    end = min(len(text), start + length)
+    if end < len(text) and text.rfind(' ', start, end) > start:
+        end = text.rfind(' ', start, end)
     
+    prefix = '…' if start > 0 else ''
+    snippet = prefix + text[start:end] + ('…' if end < len(text) else '')
+    shift = len(prefix) - start
+    return snippet, [(s + shift, e + shift) for s, e in highlights if s >= start and e <= end]
+
+# Sort key element types of each kind of cursor: (chapter, verse, id) and (tier, score, id)
+CURSOR_KEY_TYPES = {'ref': (int, int, int), 'text': (int, (int, float), int)}
+
+def encode_cursor(position: Dict) -> str:
+    """Opaque pagination cursor for the position after the last result of a page"""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Dict:
+    """Inverse of encode_cursor; raises ValueError for a cursor it didn't produce"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(position, dict) or not any(kind in position for kind in CURSOR_KEY_TYPES) or not all(
+            _valid_key(position[kind], types) for kind, types in CURSOR_KEY_TYPES.items() if kind in position):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(position.get('query', ''), str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return position
+
+def _valid_key(key, types: tuple) -> bool:
+    """Whether a cursor's sort key is a list of finite numbers of the given types (bools excluded)"""
+    return (isinstance(key, list) and len(key) == len(types)
+            and all(isinstance(value, kind) and not isinstance(value, bool) and math.isfinite(value)
+                    for value, kind in zip(key, types)))
+
+# Proximity query: "<words or quoted phrase> NEAR/<n> <words or quoted phrase>"
+NEAR_PATTERN = re.compile(r'^(.+?)\s+NEAR/(\d+)\s+(.+)$')
+
 class SimpleScriptureSearch:
-    def __init__(self, db_path: str = "simple_scriptures.db"):
+    def __init__(self, db_path: str = "simple_scriptures.db", conn: sqlite3.Connection = None,
+                 keep_verses: bool = False):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-        self.setup_database()
-        self.verses = []
-        self.reference_parser = ScriptureReferenceParser()
+        self.keep_verses = keep_verses
+        self.fts_enabled = False
+        self.index = None  # Optional in-memory ScriptureIndex, see build_index()
+        self.term_dictionary = None  # Optional TermDictionary, see build_term_dictionary()
+        self.result_cache = None  # Optional QueryCache, see enable_cache()
+        self.semantic_index = None  # Optional SemanticIndex, see build_semantic_index()
+        # Copies made by with_connection() share these, so an index built lazily is built once for all of them
+        self._origin = self
+        self._build_lock = threading.Lock()
+        if conn is None:
+            self.conn = sqlite3.connect(db_path)
+            self.setup_database()
+        else:
+            # Caller owns the connection (e.g. one per Flask request); schema already set up
+            self.conn = conn
+            self.fts_enabled = self._fts_available()
+        self.verses = []  # Every verse loaded by load_csv_file(), only kept with keep_verses
+        self.reference_parser = ScriptureReferenceParser(self._book_titles())
+    
+    def _book_titles(self) -> List[tuple]:
+        """(title, short title) of every book in the database"""
+        try:
+            return self.conn.execute('SELECT book, short_title FROM books').fetchall()
+        except sqlite3.OperationalError:  # database set up before the books table existed
+            return []
+        
+    def _volume_title(self, volume: str) -> str:
+        """Stored title of a volume, matched case-insensitively (volume itself when unknown)"""
+        row = self.conn.execute('SELECT volume FROM books WHERE volume = ? COLLATE NOCASE LIMIT 1',
+                                (volume,)).fetchone()
+        return row[0] if row else volume
         
     def setup_database(self):
         """Create the database schema"""
@@ -185,9 +404,18 @@ class SimpleScriptureSearch:
                 book_id INTEGER,
                 verse_id INTEGER,
                 lds_url TEXT,
-                source_file TEXT
+                source_file TEXT,
+                content_hash INTEGER
             )
         ''')
+        # Databases created before sync_csv_file() lack the content hash; backfill it once
+        cursor.execute('PRAGMA table_info(scriptures)')
+        if 'content_hash' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE scriptures ADD COLUMN content_hash INTEGER')
+            stored = pd.DataFrame(cursor.execute(f'SELECT id, {", ".join(CONTENT_COLUMNS)} FROM scriptures')
+                                  .fetchall(), columns=['id'] + CONTENT_COLUMNS, dtype=object)
+            cursor.executemany('UPDATE scriptures SET content_hash = ? WHERE id = ?',
+                               zip(content_hashes(stored), stored['id']))
         
         # Create index for faster searching
         cursor.execute('''
@@ -196,125 +424,727 @@ class SimpleScriptureSearch:
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_volume ON scriptures(volume)
         ''')
+        # One row per verse: the unique key lets load_csv_file() skip verses already
+        # loaded, and its (book, chapter, verse) prefix serves reference lookups
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_verse ON scriptures(book, chapter, verse, volume)
+        ''')
+        # Earlier databases also carry idx_reference on (book, chapter, verse), a duplicate of idx_verse's prefix
+        cursor.execute('DROP INDEX IF EXISTS idx_reference')
+        
+        # Related verses, precomputed by build_verse_neighbors(); rank 1 is the closest
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS verse_neighbors (
+                verse_id INTEGER NOT NULL,
+                rank INTEGER NOT NULL,
+                neighbor_id INTEGER NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (verse_id, rank)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Near-duplicate verses across volumes, found by build_parallel_passages();
+        # each pair is stored in both directions so either verse is a keyed read
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS parallel_passages (
+                verse_id INTEGER NOT NULL,
+                parallel_id INTEGER NOT NULL,
+                similarity REAL NOT NULL,
+                PRIMARY KEY (verse_id, parallel_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # One row per book with its short title ("1 Ne."), the source of the reference parser's aliases
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'books'")
+        books_existed = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS books (
+                book TEXT PRIMARY KEY,
+                volume TEXT NOT NULL,
+                short_title TEXT,
+                book_id INTEGER
+            )
+        ''')
+        if not books_existed:
+            cursor.execute('''
+                INSERT OR IGNORE INTO books (book, volume, book_id)
+                SELECT book, volume, MIN(book_id) FROM scriptures GROUP BY book
+            ''')
+        
+        self._setup_concordance(cursor)
+        self.fts_enabled = self._setup_fts(cursor)
         
         self.conn.commit()
     
-    def load_csv_file(self, file_path: str, source_name: str = None):
-        """Load a CSV file with scripture data"""
-        if source_name is None:
-            source_name = Path(file_path).stem
-            
-        print(f"\n=== Loading {source_name} from {file_path} ===")
+    def _setup_concordance(self, cursor):
+        """Create the word-count and collocation tables that load_csv_file() keeps up to date"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'word_counts'")
+        concordance_existed = cursor.fetchone() is not None
         
-        if not Path(file_path).exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS word_counts (
+                word TEXT NOT NULL,
+                volume TEXT NOT NULL,
+                book TEXT NOT NULL,
+                occurrences INTEGER NOT NULL,
+                verses INTEGER NOT NULL,
+                PRIMARY KEY (word, volume, book)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS collocations (
+                word TEXT NOT NULL,
+                neighbor TEXT NOT NULL,
+                occurrences INTEGER NOT NULL,
+                PRIMARY KEY (word, neighbor)
+            ) WITHOUT ROWID
+        ''')
         
-        # Check if this source has already been loaded
+        # Databases loaded before the concordance existed need a one-time count
+        if not concordance_existed:
+            cursor.execute('SELECT COUNT(*) FROM scriptures')
+            if cursor.fetchone()[0] > 0:
+                print("Building concordance for existing verses...")
+                rebuild_concordance(cursor)
+    
+    def _setup_fts(self, cursor) -> bool:
+        """Create the FTS5 full-text index and the triggers that keep it in sync"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'scriptures_fts'")
+        fts_existed = cursor.fetchone() is not None
+        
+        try:
+            # External-content table: the verse text is stored once, in scriptures
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS scriptures_fts USING fts5(
+                    text, content='scriptures', content_rowid='id'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  SQLite FTS5 not available ({e}), using LIKE search")
+            return False
+        
+        cursor.execute(FTS_INSERT_TRIGGER)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS scriptures_fts_delete AFTER DELETE ON scriptures BEGIN
+                INSERT INTO scriptures_fts(scriptures_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS scriptures_fts_update AFTER UPDATE OF text ON scriptures BEGIN
+                INSERT INTO scriptures_fts(scriptures_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO scriptures_fts(rowid, text) VALUES (new.id, new.text);
+            END
+        ''')
+        
+        # Vocabulary view (term, verse count) over the full-text index
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS scriptures_fts_vocab USING fts5vocab(scriptures_fts, 'row')
+        ''')
+        
+        # Databases created before the full-text index existed need a one-time build
+        if not fts_existed:
+            cursor.execute('SELECT COUNT(*) FROM scriptures')
+            if cursor.fetchone()[0] > 0:
+                print("Building full-text index for existing verses...")
+                cursor.execute("INSERT INTO scriptures_fts(scriptures_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    def _fts_available(self) -> bool:
+        """Check whether the full-text index exists on this connection's database"""
         cursor = self.conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM scriptures WHERE source_file = ?', (source_name,))
-        existing_count = cursor.fetchone()[0]
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'scriptures_fts'")
+        return cursor.fetchone() is not None
+    
+    def build_index(self):
+        """Load the corpus into an in-memory index that serves text searches without SQLite"""
+        from scripture_index import ScriptureIndex
         
-        if existing_count > 0:
-            print(f"⚠️  {source_name} already loaded ({existing_count} verses). Skipping to avoid duplicates.")
-            print("If you want to reload, delete the database file: simple_scriptures.db")
-            return existing_count
+        print("Building in-memory search index...")
+        self.index = ScriptureIndex.from_connection(self.conn)
+        print(f"✅ Indexed {len(self.index):,} verses ({len(self.index.postings):,} terms)")
+        return self.index
+    
+    def build_semantic_index(self):
+        """Build the LSA vectors and faiss index behind mode='semantic' searches"""
+        from semantic_search import SemanticIndex
         
-        df = pd.read_csv(file_path)
-        print(f"Found {len(df)} verses in {source_name}")
+        print("Building semantic search index...")
+        self.semantic_index = SemanticIndex.from_connection(self.conn)
+        stats = self.semantic_index.stats()
+        print(f"✅ Semantic index ready ({stats['verses']:,} verses, {stats['dimensions']} dimensions, {stats['index']})")
+        return self.semantic_index
+    
+    def build_term_dictionary(self):
+        """Build the sorted term dictionary (plus book aliases) behind suggest()"""
+        from scripture_index import TermDictionary
         
-        verses = []
-        errors = 0
-        duplicates_skipped = 0
-        
-        for idx, row in df.iterrows():
-            try:
-                volume = str(row['volume_title']).strip()
-                book = str(row['book_title']).strip()
-                chapter = int(row['chapter_number'])
-                verse_num = int(row['verse_number'])
-                text = str(row['scripture_text']).strip()
-                
-                # Check for existing verse to prevent duplicates
-                cursor.execute('''
-                    SELECT COUNT(*) FROM scriptures 
-                    WHERE volume = ? AND book = ? AND chapter = ? AND verse = ?
-                ''', (volume, book, chapter, verse_num))
-                
-                if cursor.fetchone()[0] > 0:
-                    duplicates_skipped += 1
-                    continue
-                
-                verse = ScriptureVerse(
-                    volume=volume,
-                    book=book,
-                    chapter=chapter,
-                    verse=verse_num,
-                    text=text,
-                    volume_id=int(row['volume_id']) if pd.notna(row['volume_id']) else None,
-                    book_id=int(row['book_id']) if pd.notna(row['book_id']) else None,
-                    verse_id=int(row['verse_id']) if pd.notna(row['verse_id']) else None,
-                    lds_url=str(row['book_lds_url']).strip() if pd.notna(row['book_lds_url']) else None,
-                )
-                
-                # Insert into database
-                cursor.execute('''
-                    INSERT INTO scriptures (
-                        volume, book, chapter, verse, text,
-                        volume_id, book_id, verse_id, lds_url, source_file
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    verse.volume, verse.book, verse.chapter, verse.verse, verse.text,
-                    verse.volume_id, verse.book_id, verse.verse_id, verse.lds_url, source_name
-                ))
-                
-                verses.append(verse)
-                
-                if (idx + 1) % 5000 == 0:
-                    print(f"  Processed {idx + 1} verses...")
-                    
-            except Exception as e:
-                errors += 1
-                if errors <= 5:
-                    print(f"Error processing row {idx}: {e}")
+        book_aliases = self.reference_parser.book_mappings
+        if self.index is not None:
+            self.term_dictionary = TermDictionary.from_index(self.index, book_aliases)
+        elif self.fts_enabled:
+            self.term_dictionary = TermDictionary.from_connection(self.conn, book_aliases)
+        else:
+            from scripture_index import ScriptureIndex
+            self.term_dictionary = TermDictionary.from_index(ScriptureIndex.from_connection(self.conn), book_aliases)
+        print(f"✅ Term dictionary ready ({len(self.term_dictionary):,} terms)")
+        return self.term_dictionary
+    
+    def suggest(self, prefix: str, limit: int = 10) -> Dict:
+        """Book names and query completions for a partially typed query"""
+        self._build_shared('term_dictionary', self.build_term_dictionary)
+        return self.term_dictionary.suggest(prefix, limit)
+    
+    def enable_cache(self, max_size: int = 1024, ttl: Optional[float] = 3600) -> QueryCache:
+        """Cache search_text results; the cache is cleared whenever the corpus changes"""
+        self.result_cache = QueryCache(max_size, ttl)
+        return self.result_cache
+    
+    def warm_cache(self, queries) -> int:
+        """Run (query, limit) pairs ahead of time so their first request is a cache hit"""
+        for query, limit in queries:
+            self.search_text(query, limit=limit)
+        return len(queries)
+    
+    def with_connection(self, conn: sqlite3.Connection) -> 'SimpleScriptureSearch':
+        """Return a copy sharing this instance's in-memory state but using conn for SQL"""
+        bound = copy.copy(self)
+        bound.conn = conn
+        return bound
+    
+    def _build_shared(self, attribute: str, build):
+        """Build a missing in-memory index once, on the instance with_connection() copies share, and adopt it"""
+        if getattr(self, attribute) is None:
+            with self._build_lock:
+                if getattr(self._origin, attribute) is None:
+                    # Built with this copy's connection; the original's may belong to another thread
+                    setattr(self._origin, attribute, build())
+                setattr(self, attribute, getattr(self._origin, attribute))
+    
+    def load_csv_file(self, file_path: str, source_name: str = None, chunk_size: int = CSV_CHUNK_SIZE) -> int:
+        """Load a CSV file with scripture data in this process; see load_csv_files()"""
+        return self.load_csv_files([(file_path, source_name)], workers=1, chunk_size=chunk_size)
+    
+    def load_csv_files(self, files: List, workers: int = None, chunk_size: int = CSV_CHUNK_SIZE) -> int:
+        """Load CSV files (paths or (path, source_name) pairs) in one transaction, preparing chunks on workers"""
+        cursor = self.conn.cursor()
+        sources = []
+        for entry in files:
+            file_path, source_name = (entry, None) if isinstance(entry, (str, Path)) else entry
+            if source_name is None:
+                source_name = Path(file_path).stem
+            if not Path(file_path).exists():
+                raise FileNotFoundError(f"File not found: {file_path}")
+        
+            cursor.execute('SELECT COUNT(*) FROM scriptures WHERE source_file = ?', (source_name,))
+            existing_count = cursor.fetchone()[0]
+            if existing_count > 0:
+                print(f"⚠️  {source_name} already loaded ({existing_count} verses). Skipping to avoid duplicates.")
+                print("To apply changes made to the file since, use sync_csv_file()")
                 continue
         
-        self.conn.commit()
+            columns = pd.read_csv(file_path, nrows=0).columns
+            missing = [column for column in CSV_REQUIRED_COLUMNS if column not in columns]
+            if missing:
+                print(f"❌ {source_name} is missing columns: {', '.join(missing)}")
+                continue
+            sources.append((str(file_path), source_name))
+        
+        if not sources:
+            return 0
         
-        if errors > 5:
-            print(f"  ... and {errors - 5} more errors")
+        workers = workers or os.cpu_count()
+        print(f"\n=== Loading {', '.join(source_name for _, source_name in sources)} "
+              f"with {workers} worker process{'es' if workers > 1 else ''} ===")
+        started = time.time()
+        totals = {source_name: {'rows': 0, 'errors': 0, 'inserted': 0} for _, source_name in sources}
+        with self._bulk_load():
+            last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM scriptures').fetchone()[0]
+            if self.fts_enabled:
+                cursor.execute('DROP TRIGGER IF EXISTS scriptures_fts_insert')
+        
+            for source_name, rows, (frame, invalid, word_counts) in self._prepared_chunks(sources, chunk_size, workers):
+                file_totals = totals[source_name]
+                for idx in invalid[:max(0, 5 - file_totals['errors'])]:
+                    print(f"Error processing row {idx} of {source_name}: missing or non-numeric chapter/verse number")
+                file_totals['rows'] += rows
+                file_totals['errors'] += len(invalid)
+                file_totals['inserted'] += self._insert_verses(cursor, frame, source_name, word_counts)
+                print(f"  Processed {file_totals['rows']:,} rows of {source_name}...")
+        
+            if self.fts_enabled:
+                cursor.execute('INSERT INTO scriptures_fts(rowid, text) SELECT id, text FROM scriptures WHERE id > ?',
+                               (last_id,))
+                cursor.execute(FTS_INSERT_TRIGGER)
+            self.conn.commit()
+        self.reference_parser = ScriptureReferenceParser(self._book_titles())
+        elapsed = time.time() - started
+        rows, errors, inserted = (sum(file_totals[key] for file_totals in totals.values())
+                                  for key in ('rows', 'errors', 'inserted'))
+        duplicates_skipped = rows - errors - inserted
+        
+        for source_name, file_totals in totals.items():
+            print(f"✅ {source_name}: {file_totals['inserted']} new verses from {file_totals['rows']:,} rows "
+                  f"with {file_totals['errors']} errors")
         
         if duplicates_skipped > 0:
             print(f"⚠️  Skipped {duplicates_skipped} duplicate verses")
         
-        print(f"✅ Successfully loaded {len(verses)} new verses from {source_name} with {errors} errors")
+        print(f"✅ Successfully loaded {inserted} new verses from {len(sources)} files with {errors} errors")
+        print(f"  {rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-6):,.0f} rows/sec)")
+        
+        self._after_load(last_id, inserted)
+        
+        return inserted
+    
+    @staticmethod
+    def _prepared_chunks(sources: List[tuple], chunk_size: int, workers: int) -> Iterator[tuple]:
+        """(source_name, rows, prepare_csv_chunk() result) of every chunk in order, at most two per worker in flight"""
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        chunks = ((source_name, chunk) for file_path, source_name in sources
+                  for chunk in pd.read_csv(file_path, chunksize=chunk_size))
+        if workers <= 1:
+            for source_name, chunk in chunks:
+                yield source_name, len(chunk), prepare_csv_chunk(chunk)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for source_name, chunk in chunks:
+                pending.append((source_name, len(chunk), pool.submit(prepare_csv_chunk, chunk)))
+                if len(pending) > 2 * workers:
+                    source_name, rows, future = pending.popleft()
+                    yield source_name, rows, future.result()
+            while pending:
+                source_name, rows, future = pending.popleft()
+                yield source_name, rows, future.result()
+    
+    def sync_csv_file(self, file_path: str, source_name: str = None, chunk_size: int = CSV_CHUNK_SIZE) -> Dict[str, int]:
+        """Write only the verses of a CSV file added, changed or removed since it was loaded; returns their counts"""
+        if source_name is None:
+            source_name = Path(file_path).stem
+        
+        print(f"\n=== Syncing {source_name} from {file_path} ===")
         
-        # Add to master list
-        self.verses.extend(verses)
+        if not Path(file_path).exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        columns = pd.read_csv(file_path, nrows=0).columns
+        missing = [column for column in CSV_REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            print(f"❌ {source_name} is missing columns: {', '.join(missing)}")
+            return counts
+        
+        started = time.time()
+        cursor = self.conn.cursor()
+        # key -> (id, content_hash) of every verse this source loaded
+        stored = {(book, chapter, verse, volume): (verse_id, stored_hash)
+                  for verse_id, book, chapter, verse, volume, stored_hash in cursor.execute(
+                      'SELECT id, book, chapter, verse, volume, content_hash FROM scriptures WHERE source_file = ?',
+                      (source_name,))}
+        seen = set()
+        errors = 0
+        with self._bulk_load():
+            for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+                frame, invalid = clean_scripture_frame(chunk)
+                errors += len(invalid)
+                # Every chunk, not just new verses: databases from before the books table lack short titles
+                self._upsert_books(cursor, frame)
+                new_rows, changed = [], []
+                keys = zip(frame['book'], frame['chapter'], frame['verse'], frame['volume'])
+                for position, (key, row_hash) in enumerate(zip(keys, frame['content_hash'])):
+                    match = stored.get(key)
+                    if match is None:
+                        new_rows.append(position)
+                    elif key not in seen:
+                        seen.add(key)
+                        if match[1] != row_hash:
+                            changed.append((match[0], position))
+        
+                if changed:
+                    ids = [verse_id for verse_id, _ in changed]
+                    update_concordance(cursor, self._verse_texts(ids), -1)
+                    rows = frame.iloc[[position for _, position in changed]][CONTENT_COLUMNS + ['content_hash']]
+                    cursor.executemany(f'''
+                        UPDATE scriptures SET {", ".join(f"{column} = ?" for column in rows.columns)}
+                        WHERE id = ?
+                    ''', (row + (verse_id,) for verse_id, row in zip(ids, rows.itertuples(index=False, name=None))))
+                    update_concordance(cursor, self._verse_texts(ids))
+                    counts['updated'] += len(ids)
+                if new_rows:
+                    counts['inserted'] += self._insert_verses(cursor, frame.iloc[new_rows], source_name)
+        
+            removed = [verse_id for key, (verse_id, _) in stored.items() if key not in seen]
+            if removed:
+                update_concordance(cursor, self._verse_texts(removed), -1)
+                for batch in self._id_batches(removed):
+                    marks = ', '.join('?' * len(batch))
+                    cursor.execute(f'DELETE FROM scriptures WHERE id IN ({marks})', batch)
+                    cursor.execute(f'DELETE FROM verse_neighbors WHERE verse_id IN ({marks})', batch)
+                    cursor.execute(f'DELETE FROM verse_neighbors WHERE neighbor_id IN ({marks})', batch)
+                    cursor.execute(f'DELETE FROM parallel_passages WHERE verse_id IN ({marks})', batch)
+                    cursor.execute(f'DELETE FROM parallel_passages WHERE parallel_id IN ({marks})', batch)
+                counts['deleted'] = len(removed)
+            self.conn.commit()
+        counts['unchanged'] = len(seen) - counts['updated']
+        elapsed = time.time() - started
+        
+        if errors:
+            print(f"⚠️  Skipped {errors} rows without a numeric chapter/verse number")
+        print(f"✅ Synced {source_name}: {counts['inserted']} inserted, {counts['updated']} updated, "
+              f"{counts['deleted']} deleted, {counts['unchanged']} unchanged in {elapsed:.3f}s")
+        
+        self.reference_parser = ScriptureReferenceParser(self._book_titles())
+        if counts['inserted'] or counts['updated'] or counts['deleted']:
+            if self.keep_verses:
+                self.verses = self._read_verses()
+            self._refresh_indexes()
+        
+        return counts
+    
+    def _id_batches(self, ids: List[int]) -> Iterator[List[int]]:
+        """Split ids into lists short enough to bind as one IN (...) list"""
+        batch_size = self.conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+    
+    def _verse_texts(self, ids: List[int]) -> List[tuple]:
+        """(volume, book, text) of the verses with the given ids, for update_concordance()"""
+        rows = []
+        for batch in self._id_batches(ids):
+            rows.extend(self.conn.execute(
+                f'SELECT volume, book, text FROM scriptures WHERE id IN ({", ".join("?" * len(batch))})', batch))
+        return rows
+    
+    def _after_load(self, last_id: int, inserted: int):
+        """Bring in-memory state up to date with verses just inserted past last_id and show their volumes"""
+        cursor = self.conn.cursor()
+        
+        # AUTOINCREMENT ids only grow, so the new verses are the ones past last_id
+        if self.keep_verses:
+            self.verses.extend(self._read_verses(last_id))
+        if inserted:
+            self._refresh_indexes()
         
         # Show volume breakdown
-        volumes = {}
-        for verse in verses:
-            volumes[verse.volume] = volumes.get(verse.volume, 0) + 1
+        cursor.execute('SELECT volume, COUNT(*) FROM scriptures WHERE id > ? GROUP BY volume ORDER BY MIN(id)',
+                       (last_id,))
         
         print(f"Volume breakdown:")
-        for vol, count in volumes.items():
+        for vol, count in cursor.fetchall():
             print(f"  {vol}: {count} verses")
+    
+    def _read_verses(self, after_id: int = 0) -> List[ScriptureVerse]:
+        """Every verse with an id above after_id, in id order"""
+        return [ScriptureVerse(volume=row[0], book=row[1], chapter=row[2], verse=row[3], text=row[4],
+                               volume_id=row[5], book_id=row[6], verse_id=row[7], lds_url=row[8])
+                for row in self.conn.execute(f'SELECT {RESULT_COLUMNS} FROM scriptures WHERE id > ? ORDER BY id',
+                                             (after_id,))]
+    
+    def _refresh_indexes(self):
+        """Rebuild whichever in-memory indexes are built and clear the result cache after verses change"""
+        if self.index is not None:
+            self.build_index()
+        if self.term_dictionary is not None:
+            self.build_term_dictionary()
+        if self.semantic_index is not None:
+            self.build_semantic_index()
+        if self.result_cache is not None:
+            self.result_cache.clear()
+    
+    def _insert_verses(self, cursor, frame: pd.DataFrame, source_name: str, word_counts: tuple = None) -> int:
+        """Insert a cleaned verse frame and merge its (possibly precomputed) word counts; returns verses inserted"""
+        last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM scriptures').fetchone()[0]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO scriptures (
+                volume, book, chapter, verse, text,
+                volume_id, book_id, verse_id, lds_url, source_file, content_hash
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (row[:-1] + (source_name, row[-1])
+              for row in frame[VERSE_COLUMNS + ['content_hash']].itertuples(index=False, name=None)))
+        inserted = max(cursor.rowcount, 0)
+        self._upsert_books(cursor, frame)
+        
+        if word_counts is not None and inserted == len(frame):
+            merge_counts(cursor, word_counts)
+        else:
+            update_concordance(cursor, self.conn.execute(
+                'SELECT volume, book, text FROM scriptures WHERE id > ?', (last_id,)))
+        return inserted
+    
+    @staticmethod
+    def _upsert_books(cursor, frame: pd.DataFrame):
+        """Record the books of a cleaned verse frame; their titles and short titles become reference aliases"""
+        cursor.executemany('''
+            INSERT INTO books (book, volume, short_title, book_id) VALUES (?, ?, ?, ?)
+            ON CONFLICT (book) DO UPDATE SET short_title = COALESCE(excluded.short_title, short_title)
+        ''', frame.drop_duplicates('book')[['book', 'volume', 'short_title', 'book_id']]
+             .itertuples(index=False, name=None))
+    
+    @contextmanager
+    def _bulk_load(self):
+        """Run a load in one transaction with a larger page cache, skipping fsyncs only while the database is empty"""
+        # With synchronous = OFF an OS crash or power loss can corrupt the file, which only an empty one can afford
+        fresh = self.conn.execute('SELECT NOT EXISTS (SELECT 1 FROM scriptures)').fetchone()[0]
+        pragmas = {pragma: value for pragma, value in BULK_LOAD_PRAGMAS.items() if fresh or pragma != 'synchronous'}
+        previous = {pragma: self.conn.execute(f'PRAGMA {pragma}').fetchone()[0] for pragma in pragmas}
+        for pragma, value in pragmas.items():
+            self.conn.execute(f'PRAGMA {pragma} = {value}')
+        try:
+            # Opened here, or sqlite3 would autocommit DDL issued before the first insert, like dropping the FTS trigger
+            if not self.conn.in_transaction:
+                self.conn.execute('BEGIN')
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            for pragma, value in previous.items():
+                self.conn.execute(f'PRAGMA {pragma} = {value}')
+    
+    def build_verse_neighbors(self, neighbors: int = 20, block_size: int = 256, workers: int = None) -> int:
+        """Precompute each verse's most similar verses by LSA vector; rerun after loading verses"""
+        from semantic_search import nearest_neighbors
+        
+        index = self.semantic_index or self.build_semantic_index()
+        print(f"Computing {neighbors} nearest neighbours for {len(index):,} verses...")
+        started = time.time()
+        neighbor_docs, similarities = nearest_neighbors(index.vectors, neighbors, block_size, workers)
+        print(f"  Computed in {time.time() - started:.1f}s")
         
-        return len(verses)
+        row_ids = index.row_ids
+        rows = (
+            (int(row_ids[doc]), rank + 1, int(row_ids[neighbor]), float(score))
+            for doc in range(len(neighbor_docs))
+            for rank, (neighbor, score) in enumerate(zip(neighbor_docs[doc], similarities[doc]))
+        )
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM verse_neighbors')
+        cursor.executemany(
+            'INSERT INTO verse_neighbors (verse_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)', rows)
+        self.conn.commit()
+        
+        count = neighbor_docs.size
+        print(f"✅ Stored {count:,} verse neighbours")
+        return count
     
-    def search_text(self, query: str, limit: int = 20, volume_filter: str = None) -> List[Dict]:
-        """Enhanced text search with reference parsing"""
+    def similar_verses(self, reference: str, limit: int = 10) -> List[Dict]:
+        """Verses most related to a single verse (e.g. 'Alma 32:21'), from the verse_neighbors table"""
+        reference_params_list = self.reference_parser.parse_reference(reference)
+        if not reference_params_list or 'verse' not in reference_params_list[0]:
+            return []
+        verses = self.search_by_reference(reference_params_list[0], limit=1)
+        if not verses:
+            return []
+        
+        # One primary-key range read
+        rows = self.conn.execute(f'''
+            SELECT {', '.join('s.' + column for column in RESULT_COLUMNS.split(', '))}, n.score, s.id
+            FROM verse_neighbors n
+            JOIN scriptures s ON s.id = n.neighbor_id
+            WHERE n.verse_id = ?
+            ORDER BY n.rank
+            LIMIT ?
+        ''', (verses[0]['id'], limit)).fetchall()
+        
+        results = []
+        for row in rows:
+            result = self._row_to_result(row, 'similar', row[9])
+            result['id'] = row[10]
+            results.append(result)
+        return results
+    
+    def build_parallel_passages(self, workers: int = None) -> int:
+        """Detect parallel passages (e.g. Isaiah quoted in 2 Nephi); rerun after loading verses"""
+        from parallel_passages import find_parallel_passages
+        
+        print("Detecting parallel passages...")
+        started = time.time()
+        pairs = find_parallel_passages(self.conn, workers)
+        print(f"  Found {len(pairs):,} pairs in {time.time() - started:.1f}s")
+        
+        rows = [(first, second, similarity) for first, second, similarity in pairs]
+        rows += [(second, first, similarity) for first, second, similarity in pairs]
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM parallel_passages')
+        cursor.executemany(
+            'INSERT INTO parallel_passages (verse_id, parallel_id, similarity) VALUES (?, ?, ?)', rows)
+        self.conn.commit()
+        
+        print(f"✅ Stored {len(pairs):,} parallel passages")
+        return len(pairs)
+    
+    def parallel_passages(self, verse_ids: List[int]) -> Dict[int, List[Dict]]:
+        """Parallel passages of each of verse_ids (e.g. a page of search results), most similar first"""
+        parallels = {}
+        if not verse_ids:
+            return parallels
+        placeholders = ', '.join('?' * len(verse_ids))
+        rows = self.conn.execute(f'''
+            SELECT p.verse_id, s.id, s.volume, s.book, s.chapter, s.verse, p.similarity
+            FROM parallel_passages p
+            JOIN scriptures s ON s.id = p.parallel_id
+            WHERE p.verse_id IN ({placeholders})
+            ORDER BY p.verse_id, p.similarity DESC, s.id
+        ''', list(verse_ids)).fetchall()
+        for verse_id, parallel_id, volume, book, chapter, verse, similarity in rows:
+            parallels.setdefault(verse_id, []).append({
+                'id': parallel_id,
+                'volume': volume,
+                'reference': f"{book} {chapter}:{verse}",
+                'similarity': round(similarity, 3),
+            })
+        return parallels
+    
+    def concordance(self, word: str, collocations: int = 10) -> Dict:
+        """Occurrences of a word per volume and book, and the words found most often next to it"""
+        return concordance_lookup(self.conn, word, collocations)
+    
+    def search_text(self, query: str, limit: int = 20, volume_filter: str = None,
+                    fuzzy: bool = True, cursor: str = None, mode: str = 'keyword') -> List[Dict]:
+        """Enhanced text search with reference parsing, spelling correction and keyset pages (see next_cursor)"""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode!r}")
+        if self.result_cache is None:
+            return self._search_text(query, limit, volume_filter, fuzzy, cursor, mode)
+        
+        key = (normalize_query(query), volume_filter, limit, fuzzy, cursor, mode)
+        results = self.result_cache.get(key)
+        if results is None:
+            results = self._search_text(query, limit, volume_filter, fuzzy, cursor, mode)
+            self.result_cache.put(key, results)
+        # Copies, so callers can't modify what's cached
+        return [dict(result) for result in results]
+    
+    def iter_search(self, query: str, volume_filter: str = None, page_size: int = 500,
+                    limit: int = None, fuzzy: bool = True, cursor: str = None,
+                    mode: str = 'keyword') -> Iterator[Dict]:
+        """Yield every result of search_text (or the first limit), a page at a time, bypassing the cache"""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            results = self._search_text(query, size, volume_filter, fuzzy, cursor, mode)
+            yield from results
+            cursor = self.next_cursor(results, size)
+            if cursor is None:
+                return
+            if remaining is not None:
+                remaining -= len(results)
+            
+            position = decode_cursor(cursor)
+            if mode == 'keyword' and 'text' in position:
+                corrected = position.get('query')
+                rest = self._iter_ranked(corrected or query, volume_filter, tuple(position['text']), page_size)
+                for result in itertools.islice(rest, remaining):
+                    if corrected:
+                        result['corrected_query'] = corrected
+                    yield result
+                return
+    
+    def _iter_ranked(self, query: str, volume_filter: Optional[str], after: tuple,
+                     page_size: int) -> Iterator[Dict]:
+        """Every keyword search result ranked after the key after, ranking the match set only once"""
+        plan = self._plan_text_query(query)
+        if plan is None:
+            return
+        
+        if self.index is not None:
+            if plan['tree'] is not None or plan['near']:
+                tier = plan['tier'] if plan['tree'] is not None else PROXIMITY_TIER
+                docs = self._index_matches(plan)
+                docs, tiers = self.index.filter_volume(docs, volume_filter, np.full(len(docs), tier))
+                terms = plan['query_words']
+            else:
+                docs, tiers = self.index.tiered_docs(plan['phrase_words'], plan['search_words'], volume_filter)
+                terms = plan['search_words'] or plan['phrase_words']
+            docs, tiers, scores = self.index.ranked(docs, tiers, terms, after)
+            for start in range(0, len(docs), page_size):
+                page = slice(start, start + page_size)
+                yield from self._text_results(self.index.result_rows(docs[page], tiers[page], scores[page]),
+                                              plan['query_words'])
+            return
+        
+        sql, params = self._ranked_sql(*self._text_sql(plan, volume_filter), after)
+        cursor = self.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                return
+            yield from self._text_results(rows, plan['query_words'])
+    
+    def search_with_facets(self, query: str, limit: int = 20, volume_filter: str = None, fuzzy: bool = True,
+                           cursor: str = None, mode: str = 'keyword') -> Dict:
+        """A search_text page plus verse counts per volume (unfiltered) and per book of every match"""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode!r}")
+        key = ('facets', normalize_query(query), volume_filter, limit, fuzzy, cursor, mode)
+        cached = self.result_cache.get(key) if self.result_cache is not None else None
+        if cached is None:
+            facets = {'volumes': {}, 'books': {}}
+            cached = (self._search_text(query, limit, volume_filter, fuzzy, cursor, mode, facets), facets)
+            if self.result_cache is not None:
+                self.result_cache.put(key, cached)
+        results, facets = cached
+        # Copies, so callers can't modify what's cached
+        return {'results': [dict(result) for result in results],
+                'facets': {name: dict(counts) for name, counts in facets.items()}}
+    
+    @staticmethod
+    def _tally_facets(counts, volume_filter: Optional[str]) -> Dict[str, Dict[str, int]]:
+        """Facets from ((volume, book), count) pairs"""
+        facets = {'volumes': {}, 'books': {}}
+        for (volume, book), count in counts:
+            facets['volumes'][volume] = facets['volumes'].get(volume, 0) + count
+            if not volume_filter or volume == volume_filter:
+                facets['books'][book] = facets['books'].get(book, 0) + count
+        return facets
+    
+    def next_cursor(self, results: List[Dict], limit: int) -> Optional[str]:
+        """Cursor for the page after results, or None when results was the last page"""
+        if not results or len(results) < limit:
+            return None
+        last = results[-1]
+        if last['match_type'] == 'reference_lookup':
+            return encode_cursor({'ref': [last['chapter'], last['verse'], last['id']]})
+        position = {'text': [MATCH_TIERS.index(last['match_type']), last['relevance_score'], last['id']]}
+        if last.get('corrected_query'):
+            position['query'] = last['corrected_query']
+        return encode_cursor(position)
+    
+    def _search_text(self, query: str, limit: int, volume_filter: Optional[str],
+                     fuzzy: bool, cursor: Optional[str] = None, mode: str = 'keyword',
+                     facets: Dict = None) -> List[Dict]:
+        """One page of search_text results; facets, when given, is filled in for every match (see search_with_facets)"""
+        position = decode_cursor(cursor) if cursor else {}
+        
+        if 'ref' in position:
+            # Later page of a reference lookup
+            reference_params_list = self.reference_parser.parse_reference(query)
+            if not reference_params_list:
+                return []
+            return self._reference_page(reference_params_list[0], volume_filter, limit, tuple(position['ref']), facets)
+        
+        if position.get('query'):
+            # Later page of results for the corrected query
+            results = self._search_text(position['query'], limit, volume_filter, False,
+                                        encode_cursor({'text': position['text']}), mode, facets)
+            for result in results:
+                result['corrected_query'] = position['query']
+            return results
         
         # Check if query looks like a scripture reference
-        if self.reference_parser.is_reference_query(query):
+        if not position and self.reference_parser.is_reference_query(query):
             print(f"🔍 Detected reference query: '{query}'")
             reference_params_list = self.reference_parser.parse_reference(query)
             
             if reference_params_list:
                 reference_params = reference_params_list[0]
                 print(f"📖 Parsed reference: {reference_params}")
-                results = self.search_by_reference(reference_params)
+                results = self._reference_page(reference_params, volume_filter, limit, None, facets)
                 if results:
                     print(f"✅ Found {len(results)} verses for reference")
                     return results
@@ -323,120 +1153,405 @@ class SimpleScriptureSearch:
             else:
                 print(f"⚠️  Could not parse reference '{query}', falling back to text search")
         
-        # Regular text search (your existing code)
-        cursor = self.conn.cursor()
+        # Sort key (tier, score, verse id) of the last result already returned
+        after = tuple(position['text']) if position else None
+        
+        if mode == 'semantic':
+            rows = self._semantic_search(query, volume_filter, limit, after)
+            query_words = re.findall(r'\b\w+\b', query.lower())
+        else:
+            # Regular text search
+            plan = self._plan_text_query(query)
+            if plan is None:
+                return []
+            query_words = plan['query_words']
+            
+            if self.index is not None:
+                rows = self._index_search(plan, volume_filter, limit, after, facets)
+            elif facets is not None:
+                rows = self._sql_page_with_facets(plan, volume_filter, limit, after, facets)
+            else:
+                sql, params = self._text_sql(plan, volume_filter)
+                rows = self._page(sql, params, limit, after)
+        
+        results = self._text_results(rows, query_words)
+        
+        if not results and fuzzy and after is None:
+            corrected = self.correct_query(query)
+            if corrected:
+                print(f"🔤 No results for '{query}', trying '{corrected}'")
+                if facets is None:
+                    results = self.search_text(corrected, limit, volume_filter, fuzzy=False, mode=mode)
+                else:
+                    results = self._search_text(corrected, limit, volume_filter, False, None, mode, facets)
+                for result in results:
+                    result['corrected_query'] = corrected
+        
+        return results
+    
+    def _text_results(self, rows: List[tuple], query_words: List[str]) -> List[Dict]:
+        """Result dicts, with highlights, for text search rows (the RESULT_COLUMNS then tier, score and id)"""
+        results = []
+        for row in rows:
+            tier, relevance_score = row[9], row[10]
+            result = self._row_to_result(row, MATCH_TIERS[tier])
+            result['score'] = TIER_SCORES[tier]
+            result['relevance_score'] = relevance_score
+            result['id'] = row[11]
+            results.append(result)
+        
+        # Best tier first, then by relevance score
+        results.sort(key=lambda x: (MATCH_TIERS.index(x['match_type']), -x['relevance_score'], x['id']))
+        self._add_highlights(results, query_words)
+        return results
+    
+    def _add_highlights(self, results: List[Dict], words: List[str]):
+        """Set each result's 'highlights': sorted (start, end) character spans of words in its text"""
+        words = list(dict.fromkeys(word for word in words if word))
+        if not results:
+            return
+        if not words:
+            for result in results:
+                result['highlights'] = []
+        elif self.index is not None:
+            for result in results:
+                doc = self.index.doc_for_id(result['id'])
+                result['highlights'] = self.index.highlights(doc, words) if doc is not None else []
+        elif self.fts_enabled:
+            ids = [result['id'] for result in results]
+            rows = self.conn.execute(f'''
+                SELECT rowid, highlight(scriptures_fts, 0, char(1), char(2))
+                FROM scriptures_fts
+                WHERE scriptures_fts MATCH ? AND rowid IN ({', '.join('?' * len(ids))})
+            ''', [' OR '.join(f'"{word}"' for word in words)] + ids).fetchall()
+            spans = {}
+            for rowid, marked in rows:
+                # Each marker shifts the rest of the text one character right
+                offsets = [match.start() - index for index, match in enumerate(HIGHLIGHT_MARKERS.finditer(marked))]
+                spans[rowid] = list(zip(offsets[::2], offsets[1::2]))
+            for result in results:
+                result['highlights'] = spans.get(result['id'], [])
+        else:
+            # LIKE matches substrings, so highlight them the same way
+            pattern = re.compile('|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True)),
+                                 re.IGNORECASE)
+            for result in results:
+                result['highlights'] = [match.span() for match in pattern.finditer(result['text'])]
+    
+    def correct_query(self, query: str) -> Optional[str]:
+        """The query with words missing from the vocabulary replaced by their closest term, or None when none were"""
+        self._build_shared('term_dictionary', self.build_term_dictionary)
+        
+        if is_advanced_query(query) or NEAR_PATTERN.match(query.strip()):
+            tree = parse_query(query)
+            corrected = map_words(tree, self._correct_word) if tree is not None else None
+            return format_query(corrected) if corrected != tree else None
+        
+        words = re.findall(r'\b\w+\b', query.lower())
+        corrected = [self._correct_word(word) for word in words]
+        return ' '.join(corrected) if corrected != words else None
+    
+    def _correct_word(self, word: str) -> str:
+        """Closest term in the vocabulary to a word it lacks, or the word itself"""
+        if len(word) > 2 and word not in self.term_dictionary:
+            # Allow two edits only for longer words, where they are less ambiguous
+            max_distance = 1 if len(word) <= 5 else 2
+            matches = self.term_dictionary.corrections(word, max_distance, limit=1)
+            if matches:
+                return matches[0][0]
+        return word
+    
+    def _plan_text_query(self, query: str) -> Optional[Dict]:
+        """The terms each match tier needs, so all tiers are evaluated in one pass; None when nothing is searchable"""
+        if is_advanced_query(query):
+            tree = parse_query(query)
+            if tree is None:
+                return None
+            # book:1ne and book:alma mean the canonical book names, volume:"book of mormon" the stored
+            # volume title, so SQL can compare with a plain = that idx_verse and idx_volume serve
+            tree = map_fields(tree, 'book', lambda book: self.reference_parser.normalize_book_name(book) or book)
+            tree = map_fields(tree, 'volume', self._volume_title)
+            if isinstance(tree, Phrase):
+                tier = 0
+            elif isinstance(tree, Near):
+                tier = PROXIMITY_TIER
+            else:
+                tier = BOOLEAN_TIER
+            return {
+                'query_clean': query.strip().lower(),
+                'query_words': positive_words(tree),
+                'phrase_words': [],
+                'search_words': [],
+                'near': None,
+                'tree': tree,
+                'tier': tier,
+            }
+        
+        near_match = NEAR_PATTERN.match(query.strip())
+        if near_match:
+            left = re.findall(r'\b\w+\b', near_match.group(1).lower())
+            right = re.findall(r'\b\w+\b', near_match.group(3).lower())
+            if left and right:
+                return {
+                    'query_clean': query.strip().lower(),
+                    'query_words': left + right,
+                    'phrase_words': [],
+                    'search_words': [],
+                    'near': (left, right, int(near_match.group(2))),
+                    'tree': None,
+                }
         
         # Clean and prepare query
         query_clean = query.strip().lower()
         query_words = re.findall(r'\b\w+\b', query_clean)
+        search_words = list(dict.fromkeys(word for word in query_words if len(word) > 2))  # Skip very short words
         
-        results = []
+        # Exact phrase match (highest priority) only for queries of some length
+        phrase_words = query_words if len(query_clean) > 3 else []
         
-        # Strategy 1: Exact phrase match (highest priority)
-        if len(query_clean) > 3:
-            sql = '''
-                SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-                FROM scriptures 
-                WHERE LOWER(text) LIKE ?
+        if not phrase_words and not search_words:
+            return None
+        
+        return {
+            'query_clean': query_clean,
+            'query_words': query_words,
+            'phrase_words': phrase_words,
+            'search_words': search_words,
+            'near': None,
+            'tree': None,
+        }
+    
+    def _index_search(self, plan: Dict, volume_filter: Optional[str], limit: int,
+                      after: tuple = None, facets: Dict = None) -> List[tuple]:
+        """Evaluate a query plan against the in-memory index, counting facets over its matches when given"""
+        if plan['tree'] is not None or plan['near']:
+            tier = plan['tier'] if plan['tree'] is not None else PROXIMITY_TIER
+            docs = self._index_matches(plan)
+            if facets is not None:
+                facets.update(self.index.facet_counts(docs, volume_filter))
+            docs, tiers = self.index.filter_volume(docs, volume_filter, np.full(len(docs), tier))
+            return self.index.top_rows(docs, tiers, plan['query_words'], limit, after)
+        
+        if facets is None:
+            return self.index.top_tiered(plan['phrase_words'], plan['search_words'], limit, volume_filter, after)
+        # Facets need the whole match set, so rank it rather than fill the any-word tier top-k
+        docs, tiers = self.index.tiered_docs(plan['phrase_words'], plan['search_words'])
+        facets.update(self.index.facet_counts(docs, volume_filter))
+        docs, tiers = self.index.filter_volume(docs, volume_filter, tiers)
+        return self.index.top_rows(docs, tiers, plan['search_words'] or plan['phrase_words'], limit, after)
+    
+    def _semantic_search(self, query: str, volume_filter: Optional[str], limit: int,
+                         after: tuple = None) -> List[tuple]:
+        """Verses nearest to the query in the semantic index, as result rows scored by cosine similarity"""
+        self._build_shared('semantic_index', self.build_semantic_index)
+        if after is not None and after[0] > SEMANTIC_TIER:
+            return []
+        index = self.semantic_index
+        docs, scores = index.search(query, limit, volume_filter, after[1:] if after else None)
+        return [index.rows[doc] + (SEMANTIC_TIER, float(score), int(index.row_ids[doc]))
+                for doc, score in zip(docs, scores)]
+    
+    def _index_matches(self, plan: Dict) -> np.ndarray:
+        """Every document of the in-memory index matching a query plan, in any tier"""
+        if plan['tree'] is not None:
+            return evaluate_query(plan['tree'], self.index)
+        if plan['near']:
+            return self.index.match_near(*plan['near'])
+        docs = self.index.match_any(plan['search_words'])
+        if plan['phrase_words']:
+            docs = np.union1d(docs, self.index.match_phrase(plan['phrase_words']))
+        return docs
+    
+    def _sql_page_with_facets(self, plan: Dict, volume_filter: Optional[str], limit: int, after: Optional[tuple],
+                              facets: Dict) -> List[tuple]:
+        """One page of SQL search rows (see _page), counting facets from the sort keys of every match"""
+        sql, params = self._text_sql(plan, None)
+        # In verse order, so volumes and books are listed in canonical order
+        keys = self.conn.execute(f'SELECT volume, book, tier, score, id FROM ({sql}) ORDER BY id', params).fetchall()
+        facets.update(self._tally_facets(Counter((volume, book) for volume, book, *_ in keys).items(), volume_filter))
+        
+        keys = [(tier, -score, verse_id) for volume, _, tier, score, verse_id in keys
+                if not volume_filter or volume == volume_filter]
+        if after:
+            keys = [key for key in keys if key > (after[0], -after[1], after[2])]
+        page = heapq.nsmallest(limit, keys)
+        rows = {}
+        for batch in self._id_batches([verse_id for *_, verse_id in page]):
+            rows.update((row[-1], row[:-1]) for row in self.conn.execute(
+                f'SELECT {RESULT_COLUMNS}, id FROM scriptures WHERE id IN ({", ".join("?" * len(batch))})', batch))
+        return [rows[verse_id] + (tier, -negated_score, verse_id) for tier, negated_score, verse_id in page]
+    
+    def _reference_page(self, reference_params, volume_filter: Optional[str], limit: int, after: Optional[tuple],
+                        facets: Dict = None) -> List[Dict]:
+        """search_by_reference, counting facets over every verse of the reference when given"""
+        if facets is None:
+            return self.search_by_reference(reference_params, volume_filter, limit, after)
+        results = self.search_by_reference(reference_params)
+        facets.update(self._tally_facets(Counter((result['volume'], result['book']) for result in results).items(),
+                                         volume_filter))
+        return [result for result in results
+                if (not volume_filter or result['volume'] == volume_filter)
+                and (after is None or (result['chapter'], result['verse'], result['id']) > after)][:limit]
+    
+    def _page(self, sql: str, params: list, limit: int, after: tuple = None) -> List[tuple]:
+        """One page of sql's rows (RESULT_COLUMNS, tier, score, id) in result order, after the key after"""
+        sql, params = self._ranked_sql(sql, params, after)
+        return self.conn.execute(sql + ' LIMIT ?', params + [limit]).fetchall()
+    
+    @staticmethod
+    def _ranked_sql(sql: str, params: list, after: tuple = None) -> tuple:
+        """sql's rows after the key after, in result order (see _page)"""
+        sql = f'SELECT * FROM ({sql})'
+        params = list(params)
+        if after:
+            sql += ' WHERE (tier, -score, id) > (?, ?, ?)'
+            params.extend([after[0], -after[1], after[2]])
+        return sql + ' ORDER BY tier, score DESC, id', params
+    
+    def _register_relevance(self):
+        """Make _calculate_relevance available to SQL as scripture_relevance(text, 'space separated words')"""
+        self.conn.create_function(
+            'scripture_relevance', 2,
+            lambda text, words: float(self._calculate_relevance(text or '', words.split())),
+            deterministic=True)
+    
+    def _text_sql(self, plan: Dict, volume_filter: Optional[str]) -> tuple:
+        """SQL (and its parameters) selecting every verse that matches a query plan"""
+        if plan['tree'] is not None:
+            return self._query_sql(plan, volume_filter)
+        if self.fts_enabled:
+            return self._fts_sql(plan, volume_filter)
+        return self._like_sql(plan, volume_filter)
+    
+    def _fts_sql(self, plan: Dict, volume_filter: Optional[str]) -> tuple:
+        """Evaluate a query plan with FTS5 in a single statement, each verse keeping its best tier"""
+        tier_queries = []
+        params = []
+        if plan['phrase_words']:
+            tier_queries.append('SELECT rowid, 0 AS tier, rank FROM scriptures_fts WHERE scriptures_fts MATCH ?')
+            params.append('"' + ' '.join(plan['phrase_words']) + '"')
+        if plan['search_words']:
+            tier_queries.append('SELECT rowid, 1 AS tier, rank FROM scriptures_fts WHERE scriptures_fts MATCH ?')
+            params.append(' AND '.join(f'"{word}"' for word in plan['search_words']))
+            tier_queries.append('SELECT rowid, 2 AS tier, rank FROM scriptures_fts WHERE scriptures_fts MATCH ?')
+            params.append(' OR '.join(f'"{word}"' for word in plan['search_words']))
+        if plan['near']:
+            left, right, distance = plan['near']
+            tier_queries.append(f'SELECT rowid, {PROXIMITY_TIER} AS tier, rank FROM scriptures_fts WHERE scriptures_fts MATCH ?')
+            params.append(f'NEAR("{" ".join(left)}" "{" ".join(right)}", {distance})')
+        
+        sql = f'''
+            WITH candidates AS (
+                SELECT rowid AS id, MIN(tier) AS tier,
+                       COALESCE(MIN(CASE WHEN tier = 2 THEN rank END), MIN(rank)) AS rank
+                FROM ({' UNION ALL '.join(tier_queries)})
+                GROUP BY rowid
+            )
+            SELECT {', '.join('s.' + column for column in RESULT_COLUMNS.split(', '))},
+                   c.tier AS tier, -c.rank AS score, s.id AS id
+            FROM candidates c
+            JOIN scriptures s ON s.id = c.id
+        '''
+        
+        if volume_filter:
+            sql += ' WHERE s.volume = ?'
+            params.append(volume_filter)
+        
+        return sql, params
+    
+    def _query_sql(self, plan: Dict, volume_filter: Optional[str]) -> tuple:
+        """Evaluate a query-language plan in SQL: FTS5 lookups combined with SQL set logic"""
+        where, params = compile_sql(plan['tree'], self.fts_enabled)
+        words = list(dict.fromkeys(plan['query_words']))
+        
+        if self.fts_enabled and words:
+            # Rank by bm25 of the words the query searches for; verses matched
+            # only through NOT or field filters score 0, after every ranked one
+            rank_join = '''
+                LEFT JOIN (SELECT rowid, rank FROM scriptures_fts WHERE scriptures_fts MATCH ?) r
+                ON r.rowid = s.id
             '''
-            params = [f'%{query_clean}%']
-            
+            params = [' OR '.join(f'"{word}"' for word in words)] + params
+            score = '-COALESCE(r.rank, 0.0)'
+        else:
+            self._register_relevance()
+            rank_join, score = '', 'scripture_relevance(s.text, ?)'
+            params = [' '.join(words)] + params
+        
+        sql = f'''
+            SELECT {', '.join('s.' + column for column in RESULT_COLUMNS.split(', '))},
+                   {plan['tier']} AS tier, {score} AS score, s.id AS id
+            FROM scriptures s {rank_join}
+            WHERE {where}
+        '''
+        
+        if volume_filter:
+            sql += ' AND s.volume = ?'
+            params.append(volume_filter)
+        
+        return sql, params
+    
+    def _like_sql(self, plan: Dict, volume_filter: Optional[str]) -> tuple:
+        """Fallback for SQLite builds without FTS5: one scan that tags each verse with its tier"""
+        self._register_relevance()
+        relevance_params = [' '.join(plan['query_words'])]
+        
+        if plan['near']:
+            words = plan['query_words']
+            sql = f'''
+                SELECT {RESULT_COLUMNS}, {PROXIMITY_TIER} AS tier, scripture_relevance(text, ?) AS score, id
+                FROM scriptures
+                WHERE {' AND '.join(['LOWER(text) LIKE ?'] * len(words))}
+            '''
+            params = relevance_params + [f'%{word}%' for word in words]
             if volume_filter:
                 sql += ' AND volume = ?'
                 params.append(volume_filter)
-            
-            sql += ' ORDER BY LENGTH(text) LIMIT ?'
-            params.append(limit // 2)
-            
-            cursor.execute(sql, params)
-            for row in cursor.fetchall():
-                results.append({
-                    'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                    'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                    'lds_url': row[8], 'reference': f"{row[1]} {row[2]}:{row[3]}",
-                    'match_type': 'exact_phrase', 'score': 100
-                })
-        
-        # Strategy 2: All words present (medium priority)
-        if query_words and len(results) < limit:
-            conditions = []
-            params = []
-            
-            for word in query_words:
-                if len(word) > 2:  # Skip very short words
-                    conditions.append('LOWER(text) LIKE ?')
-                    params.append(f'%{word}%')
-            
-            if conditions:
-                sql = f'''
-                    SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-                    FROM scriptures 
-                    WHERE {' AND '.join(conditions)}
-                '''
-                
-                if volume_filter:
-                    sql += ' AND volume = ?'
-                    params.append(volume_filter)
-                
-                sql += ' ORDER BY LENGTH(text) LIMIT ?'
-                params.append(limit - len(results))
-                
-                cursor.execute(sql, params)
-                for row in cursor.fetchall():
-                    # Avoid duplicates
-                    ref = f"{row[1]} {row[2]}:{row[3]}"
-                    if not any(r['reference'] == ref for r in results):
-                        results.append({
-                            'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                            'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                            'lds_url': row[8], 'reference': ref,
-                            'match_type': 'all_words', 'score': 80
-                        })
-        
-        # Strategy 3: Any word present (lower priority)
-        if query_words and len(results) < limit:
-            word_conditions = []
-            params = []
-            
-            for word in query_words:
-                if len(word) > 2:
-                    word_conditions.append('LOWER(text) LIKE ?')
-                    params.append(f'%{word}%')
-            
-            if word_conditions:
-                sql = f'''
-                    SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url
-                    FROM scriptures 
-                    WHERE ({' OR '.join(word_conditions)})
-                '''
-                
-                if volume_filter:
-                    sql += ' AND volume = ?'
-                    params.append(volume_filter)
-                
-                sql += ' ORDER BY LENGTH(text) LIMIT ?'
-                params.append(limit - len(results))
-                
-                cursor.execute(sql, params)
-                for row in cursor.fetchall():
-                    # Avoid duplicates
-                    ref = f"{row[1]} {row[2]}:{row[3]}"
-                    if not any(r['reference'] == ref for r in results):
-                        results.append({
-                            'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                            'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                            'lds_url': row[8], 'reference': ref,
-                            'match_type': 'any_word', 'score': 60
-                        })
-        
-        # Calculate relevance scores
-        for result in results:
-            result['relevance_score'] = self._calculate_relevance(result['text'], query_words)
-        
-        # Sort by relevance score
-        results.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        return results[:limit]
+            return sql, params
+        
+        word_conditions = ['LOWER(text) LIKE ?'] * len(plan['search_words'])
+        word_params = [f'%{word}%' for word in plan['search_words']]
+        
+        tier_cases = []
+        case_params = []
+        match_conditions = []
+        match_params = []
+        if plan['phrase_words']:
+            tier_cases.append('WHEN LOWER(text) LIKE ? THEN 0')
+            case_params.append(f"%{plan['query_clean']}%")
+            match_conditions.append('LOWER(text) LIKE ?')
+            match_params.append(f"%{plan['query_clean']}%")
+        if word_conditions:
+            tier_cases.append(f"WHEN {' AND '.join(word_conditions)} THEN 1")
+            case_params.extend(word_params)
+            match_conditions.extend(word_conditions)
+            match_params.extend(word_params)
+        
+        sql = f'''
+            SELECT {RESULT_COLUMNS}, CASE {' '.join(tier_cases)} ELSE 2 END AS tier,
+                   scripture_relevance(text, ?) AS score, id
+            FROM scriptures 
+            WHERE ({' OR '.join(match_conditions)})
+        '''
+        params = case_params + relevance_params + match_params
+        
+        if volume_filter:
+            sql += ' AND volume = ?'
+            params.append(volume_filter)
+        
+        return sql, params
+    
+    def _row_to_result(self, row, match_type: str, relevance_score: float = None) -> Dict:
+        """Convert a row of RESULT_COLUMNS into a search result dict"""
+        result = {
+            'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
+            'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
+            'lds_url': row[8], 'reference': f"{row[1]} {row[2]}:{row[3]}",
+            'match_type': match_type
+        }
+        if relevance_score is not None:
+            result['relevance_score'] = relevance_score
+        return result
     
     def _calculate_relevance(self, text: str, query_words: List[str]) -> float:
         """Calculate relevance score for text based on query words"""
@@ -495,6 +1610,7 @@ class SimpleScriptureSearch:
         print("Commands:")
         print("  'search <query>' - Search all scriptures")
         print("  'filter <volume> <query>' - Search within specific volume")
+        print("  'concordance <word>' - Word counts by volume and book, with collocations")
         print("  'stats' - Show database statistics")
         print("  'quit' - Exit")
         print("-" * 50)
@@ -514,6 +1630,27 @@ class SimpleScriptureSearch:
             elif user_input.lower() == 'stats':
                 self.get_statistics()
             
+            elif user_input.startswith('concordance '):
+                word = user_input[12:].strip()
+                try:
+                    counts = self.concordance(word)
+                except ValueError as e:
+                    print(e)
+                    continue
+                
+                if counts['occurrences']:
+                    print(f"\n'{counts['word']}' occurs {counts['occurrences']:,} times in {counts['verses']:,} verses")
+                    for volume, occurrences in counts['volumes'].items():
+                        print(f"  {volume}: {occurrences:,}")
+                    print("Top books:")
+                    for book in counts['books'][:10]:
+                        print(f"  {book['book']}: {book['occurrences']:,} in {book['verses']:,} verses")
+                    if counts['collocations']:
+                        print("Found with: " + ', '.join(
+                            f"{collocation['word']} ({collocation['occurrences']})" for collocation in counts['collocations']))
+                else:
+                    print(f"\n'{counts['word']}' does not occur in the scriptures.")
+            
             elif user_input.startswith('search '):
                 query = user_input[7:]
                 try:
@@ -596,42 +1733,90 @@ class SimpleScriptureSearch:
                     print(f"Available volumes: {', '.join(volumes)}")
             
             else:
-                print("Unknown command. Use 'search <query>', 'filter <volume> <query>', 'stats', or 'quit'")
+                print("Unknown command. Use 'search <query>', 'filter <volume> <query>', 'concordance <word>', 'stats', or 'quit'")
 
-    def search_by_reference(self, reference_params):
-        """Search by specific scripture reference"""
+    def search_by_reference(self, reference_params, volume_filter: str = None,
+                            limit: int = None, after: tuple = None):
+        """Search by specific scripture reference, at most limit verses after the (chapter, verse, id) key after"""
         cursor = self.conn.cursor()
         
-        # Build SQL query based on reference parameters
-        sql = 'SELECT volume, book, chapter, verse, text, volume_id, book_id, verse_id, lds_url FROM scriptures WHERE book = ?'
+        # Build SQL query based on reference parameters: one contiguous
+        # (chapter, verse) range of idx_verse, even across chapters
+        sql = f'SELECT {RESULT_COLUMNS}, id FROM scriptures WHERE book = ?'
         params = [reference_params['book']]
         
         if 'chapter' in reference_params:
-            sql += ' AND chapter = ?'
-            params.append(reference_params['chapter'])
+            sql += ' AND (chapter, verse) BETWEEN (?, ?) AND (?, ?)'
+            params.extend(self._reference_range(reference_params))
         
-        if 'verse' in reference_params:
-            sql += ' AND verse = ?'
-            params.append(reference_params['verse'])
-        elif 'verse_start' in reference_params and 'verse_end' in reference_params:
-            sql += ' AND verse BETWEEN ? AND ?'
-            params.extend([reference_params['verse_start'], reference_params['verse_end']])
+        if volume_filter:
+            sql += ' AND volume = ?'
+            params.append(volume_filter)
+        
+        if after:
+            sql += ' AND (chapter, verse, id) > (?, ?, ?)'
+            params.extend(after)
         
-        sql += ' ORDER BY chapter, verse'
+        sql += ' ORDER BY chapter, verse, id'
+        
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
         
         cursor.execute(sql, params)
         results = []
         
         for row in cursor.fetchall():
-            results.append({
-                'volume': row[0], 'book': row[1], 'chapter': row[2], 'verse': row[3],
-                'text': row[4], 'volume_id': row[5], 'book_id': row[6], 'verse_id': row[7],
-                'lds_url': row[8], 'reference': f"{row[1]} {row[2]}:{row[3]}",
-                'match_type': 'reference_lookup', 'relevance_score': 100.0
-            })
+            result = self._row_to_result(row, 'reference_lookup', 100.0)
+            result['id'] = row[9]
+            results.append(result)
         
         return results
 
+    @staticmethod
+    def _reference_range(reference_params) -> tuple:
+        """(chapter, verse) bounds, inclusive, of the verses a parsed reference covers"""
+        chapter = reference_params['chapter']
+        if 'verse' in reference_params:
+            return chapter, reference_params['verse'], chapter, reference_params['verse']
+        return (chapter, reference_params.get('verse_start', 0),
+                reference_params.get('chapter_end', chapter), reference_params.get('verse_end', LAST_VERSE))
+    
+    def resolve_references(self, references: List[str], volume_filter: str = None) -> List[Dict]:
+        """Verses of many references at once (e.g. a lesson's reading list), one entry per reference in order"""
+        parsed = [entry for text in references for entry in self.reference_parser.parse_references(text)]
+        resolved = [{'reference': text, 'book': reference_params['book'] if reference_params else None, 'results': []}
+                    for text, reference_params in parsed]
+        ranges = [(ordinal, reference_params['book']) + self._reference_range(reference_params)
+                  for ordinal, (_, reference_params) in enumerate(parsed) if reference_params]
+        
+        columns = ', '.join('s.' + column for column in RESULT_COLUMNS.split(', '))
+        # Stay under SQLite's bound-parameter limit; one statement covers hundreds of references
+        batch_size = max(1, (self.conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) - 1) // 6)
+        for start in range(0, len(ranges), batch_size):
+            batch = ranges[start:start + batch_size]
+            sql = f'''
+                WITH refs (ordinal, book, chapter_start, verse_start, chapter_end, verse_end) AS (
+                    VALUES {', '.join(['(?, ?, ?, ?, ?, ?)'] * len(batch))}
+                )
+                SELECT refs.ordinal, {columns}, s.id
+                FROM refs
+                JOIN scriptures s ON s.book = refs.book
+                    AND (s.chapter, s.verse) BETWEEN (refs.chapter_start, refs.verse_start)
+                                                 AND (refs.chapter_end, refs.verse_end)
+            '''
+            params = [value for reference_range in batch for value in reference_range]
+            if volume_filter:
+                sql += ' WHERE s.volume = ?'
+                params.append(volume_filter)
+            sql += ' ORDER BY refs.ordinal, s.chapter, s.verse, s.id'
+            
+            for row in self.conn.execute(sql, params):
+                result = self._row_to_result(row[1:], 'reference_lookup', 100.0)
+                result['id'] = row[10]
+                resolved[row[0]]['results'].append(result)
+        return resolved
+
 def test_references():
     """Test the reference search functionality"""
     search = SimpleScriptureSearch()
@@ -653,21 +1838,34 @@ def test_references():
         else:
             print("   ⚠️  Not detected as reference")
 
-# Uncomment this line to test:
-test_references()
-
 def main():
-    """Main function"""
+    """Main function: python simple_scripture_search.py [--db PATH] [--workers N] [file.csv ...]"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Simple Scripture Search')
+    parser.add_argument('files', nargs='*', help='CSV files to load, parsed in parallel')
+    parser.add_argument('--db', default='simple_scriptures.db', help='database path')
+    parser.add_argument('--workers', type=int, help='parser processes (default: one per core)')
+    args = parser.parse_args()
+
     print("🔍 Simple Scripture Search System")
     print("=" * 40)
     print("This version uses only basic text search - no AI dependencies required!")
     
     # Initialize the system
-    search = SimpleScriptureSearch()
+    search = SimpleScriptureSearch(args.db)
+    
+    if args.files:
+        search.load_csv_files(args.files, workers=args.workers)
+        return
+    
+    # Not run at import: load_csv_files() workers may import this module
+    test_references()
     
     print("\nTo load your scripture data:")
-    print("search.load_csv_file('kjvscriptures.csv', 'KJV Scriptures')")
-    print("search.load_csv_file('ldsscriptures.csv', 'LDS Scriptures')")
+    print("python simple_scripture_search.py kjvscriptures.csv ldsscriptures.csv")
+    print("search.load_csv_files([('kjvscriptures.csv', 'KJV Scriptures'), ('ldsscriptures.csv', 'LDS Scriptures')])")
+    print("search.sync_csv_file('kjvscriptures.csv', 'KJV Scriptures')  # after editing a CSV")
     print("search.interactive_mode()")
 
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Upgrading a database created by the original loader, which had only the
+scriptures table.
+"""
+
+import sqlite3
+
+import pandas as pd
+
+from simple_scripture_search import SimpleScriptureSearch
+
+VERSES = [
+    ('Book of Mormon', 'Words of Mormon', 'W of M', 1, 1, 'And now I, Mormon, being about to deliver up the record'),
+    ('Book of Mormon', 'Words of Mormon', 'W of M', 1, 2, 'And it is many years since I saw the destruction'),
+    ('Old Testament', 'Genesis', 'Gen.', 1, 1, 'In the beginning God created the heaven and the earth.'),
+]
+
+def create_baseline_database(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE scriptures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            volume TEXT NOT NULL,
+            book TEXT NOT NULL,
+            chapter INTEGER NOT NULL,
+            verse INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            volume_id INTEGER,
+            book_id INTEGER,
+            verse_id INTEGER,
+            lds_url TEXT,
+            source_file TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_text ON scriptures(text)')
+    conn.execute('CREATE INDEX idx_volume ON scriptures(volume)')
+    conn.executemany('INSERT INTO scriptures (volume, book, chapter, verse, text, source_file) VALUES (?, ?, ?, ?, ?, ?)',
+                     [(volume, book, chapter, verse, text, 'sample') for volume, book, _, chapter, verse, text in VERSES])
+    conn.commit()
+    conn.close()
+
+def write_csv(csv_path):
+    pd.DataFrame([{
+        'volume_title': volume, 'book_title': book, 'book_short_title': short_title,
+        'chapter_number': chapter, 'verse_number': verse, 'scripture_text': text,
+    } for volume, book, short_title, chapter, verse, text in VERSES]).to_csv(csv_path, index=False)
+
+def test_sync_fills_short_titles_of_upgraded_database(tmp_path):
+    db_path, csv_path = tmp_path / 'baseline.db', tmp_path / 'sample.csv'
+    create_baseline_database(db_path)
+    write_csv(csv_path)
+
+    search = SimpleScriptureSearch(str(db_path))
+    # The books backfill knows the titles but not the short titles
+    assert search.reference_parser.normalize_book_name('Genesis') == 'Genesis'
+    assert search.reference_parser.normalize_book_name('W of M') is None
+
+    counts = search.sync_csv_file(str(csv_path), 'sample')
+    assert counts['inserted'] == counts['deleted'] == 0
+    assert search.reference_parser.normalize_book_name('W of M') == 'Words of Mormon'
+    assert search.reference_parser.normalize_book_name('Gen.') == 'Genesis'
+    assert [result['reference'] for result in search.search_text('W of M 1:2')] == ['Words of Mormon 1:2']
+    search.conn.close()